@@ -25,6 +25,7 @@ def setup_project():
     print("1. Running migrations...")
     execute_from_command_line(['manage.py', 'makemigrations'])
     execute_from_command_line(['manage.py', 'migrate'])
+    execute_from_command_line(['manage.py', 'createcachetable'])
     
     # Populate categories
     print("\n2. Populating categories...")
@@ -1,8 +1,25 @@
 from django.contrib import admin
-from .models import Product, Category
+from .models import (
+    Product,
+    Category,
+    ProductTombstone,
+    ProductSimilarity,
+    SimilarityRun,
+    ProductCompanion,
+    ProductActivityBucket,
+    ProductTrendingScore,
+    ActivityCheckpoint,
+)
 
 
 admin.site.register(Product)
 admin.site.register(Category)
+admin.site.register(ProductTombstone)
+admin.site.register(ProductSimilarity)
+admin.site.register(SimilarityRun)
+admin.site.register(ProductCompanion)
+admin.site.register(ProductActivityBucket)
+admin.site.register(ProductTrendingScore)
+admin.site.register(ActivityCheckpoint)
 
 # Register your models here.
@@ -0,0 +1,157 @@
+"""
+Typeahead suggestions over product names and category names.
+
+Each worker keeps an in-memory prefix index: every word suffix of every
+name ("red running shoes", "running shoes", "shoes"), normalized and kept in
+one sorted list. A keystroke is then a bisect into that list plus a scan of
+the matching range, with no database query at all.
+
+The index is rebuilt when the catalog version (store/cache.py) moves on, but
+at most once every STORE_AUTOCOMPLETE_REFRESH_SECONDS, so a burst of product
+writes doesn't make every worker reload the catalog over and over. It is also
+rebuilt every STORE_AUTOCOMPLETE_MAX_AGE_SECONDS regardless, since the
+popularity ranking changes without any catalog write.
+
+Suggestions can therefore lag the catalog version, so responses are
+validated by an ETag over the suggestions themselves, not the catalog's.
+"""
+import hashlib
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .cache import get_catalog_version, replica_may_lag
+from .models import Category, Product, ProductActivityBucket
+
+MAX_SUGGESTIONS = 20
+
+_lock = threading.Lock()
+_index = None
+
+
+def normalize(text):
+    """Casefold and strip accents, so "Café" is found by typing "cafe\""""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+def _word_suffixes(name):
+    words = normalize(name).split(' ')
+    return [' '.join(words[start:]) for start in range(len(words)) if words[start]]
+
+
+def product_popularity():
+    """Product ID -> views over the popularity window, from the hourly counts kept by update_trending"""
+    since = timezone.now() - timedelta(days=settings.STORE_POPULARITY_DAYS)
+    rows = (
+        ProductActivityBucket.objects.filter(bucket_start__gte=since)
+        .values('product')
+        .annotate(views=Sum('views'))
+    )
+    return {row['product']: row['views'] for row in rows}
+
+
+class PrefixIndex:
+    """Every word suffix of every name, sorted, pointing back at its entry"""
+
+    def __init__(self, version, products, categories, popularity):
+        self.version = version
+        self.built_at = time.monotonic()
+        # entry: (kind, id, name, popularity)
+        self.entries = []
+        keys = []
+
+        category_sizes = {}
+        for product_id, name, category_id in products:
+            category_sizes[category_id] = category_sizes.get(category_id, 0) + 1
+            self._add(keys, 'product', product_id, name, popularity.get(product_id, 0))
+        for category_id, name in categories:
+            # A category is as popular as it is big
+            self._add(keys, 'category', category_id, name, category_sizes.get(category_id, 0))
+
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.positions = [position for _, position in keys]
+        # One- and two-letter prefixes match large ranges; remember their answers
+        self.short_prefixes = {}
+
+    def _add(self, keys, kind, object_id, name, popularity):
+        position = len(self.entries)
+        self.entries.append((kind, object_id, name, popularity))
+        for key in _word_suffixes(name):
+            keys.append((key, position))
+
+    def search(self, prefix, limit):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= 2:
+            memo_key = (prefix, limit)
+            if memo_key not in self.short_prefixes:
+                self.short_prefixes[memo_key] = self._search(prefix, limit)
+            return self.short_prefixes[memo_key]
+        return self._search(prefix, limit)
+
+    def _search(self, prefix, limit):
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\U0010ffff', start)
+        # A name can match on several of its words; count it once
+        matches = {self.positions[index] for index in range(start, end)}
+        best = heapq.nsmallest(
+            limit,
+            matches,
+            key=lambda position: (-self.entries[position][3], len(self.entries[position][2]), position),
+        )
+        return [self.entries[position] for position in best]
+
+
+def _build_index(version):
+    products = Product.objects.values_list('id', 'Productname', 'product_category')
+    categories = list(Category.objects.values_list('id', 'category'))
+    return PrefixIndex(version, products, categories, product_popularity())
+
+
+def _rebuild_due(index, version):
+    if index is None:
+        return True
+    age = time.monotonic() - index.built_at
+    if age >= settings.STORE_AUTOCOMPLETE_MAX_AGE_SECONDS:
+        return True
+    return index.version != version and age >= settings.STORE_AUTOCOMPLETE_REFRESH_SECONDS
+
+
+def get_index():
+    """This worker's index, rebuilt if the catalog has changed or it's getting old"""
+    global _index
+    version = get_catalog_version()
+    if not _rebuild_due(_index, version):
+        return _index
+
+    with _lock:
+        # Another thread may have rebuilt it while we waited
+        if _rebuild_due(_index, version):
+            # Built from a replica that may be behind: leave it unversioned so
+            # the next refresh rebuilds it
+            _index = _build_index(None if replica_may_lag() else version)
+        return _index
+
+
+def suggest(query, limit):
+    """Top ``limit`` products and categories whose name has a word starting with ``query``"""
+    return [
+        {'type': kind, 'id': object_id, 'name': name}
+        for kind, object_id, name, _ in get_index().search(query, min(limit, MAX_SUGGESTIONS))
+    ]
+
+
+def suggestions_etag(suggestions, accept):
+    """Strong ETag for ``suggestions`` rendered for the given Accept header"""
+    fingerprint = '%r|%s' % (suggestions, accept)
+    return '"%s"' % hashlib.md5(fingerprint.encode()).hexdigest()
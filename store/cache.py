@@ -0,0 +1,358 @@
+"""
+Versioned response cache for the store's read endpoints.
+
+Every cached response is stamped with the catalog version it was rendered
+under, a counter kept in the shared Django cache (Redis when REDIS_URL is
+set, otherwise the database cache table) so all gunicorn workers see the
+same value. Saving or deleting a Product, Category or Seller bumps the
+counter (see store/signals.py), which makes every stored response stale.
+
+A response older than STORE_CACHE_TIMEOUT is still served for up to
+STORE_CACHE_STALE_SECONDS while a single request re-renders it in a
+background thread. One from an older catalog version never is, so a client
+always reads back its own writes. Misses are coalesced instead: the first
+request takes a short lock in the shared cache and renders, and the others
+wait for its result rather than all querying the database at once.
+
+The same version drives the ETag / Last-Modified validators, so a client
+revalidating an unchanged catalog gets a 304 from two cache lookups without
+touching the database or the serializer.
+
+With a read replica (u_buy/db_router.py), a read served just after a write
+may come from a replica that hasn't caught up yet. Nothing read that way is
+cached until the catalog has been quiet for DATABASE_REPLICA_STICKY_SECONDS,
+so stale rows are never stored under the new version.
+
+Entries hold the final bytes: the rendered body plus, above
+STORE_CACHE_COMPRESS_MIN_BYTES, its gzip and (with the ``Brotli`` package
+from requirements.txt) brotli encodings, compressed once when the entry is stored. A hit
+only picks the variant the client's Accept-Encoding allows, with no
+rendering or compression.
+
+Single products and seller storefront headers are cached separately, one
+entry per product or seller. Each has its own version, dropped along with the
+entry when the product (or its seller or category) changes, so a write
+elsewhere in the catalog leaves them warm, and a row read before the write but
+stored after it is stored under a version that no longer counts.
+"""
+import gzip
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+from u_buy.db_router import reading_from_replica
+
+# Listed in requirements.txt; an environment without it only offers gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CATALOG_VERSION_KEY = 'store:catalog_version'
+CATALOG_MODIFIED_KEY = 'store:catalog_modified'
+CATEGORY_VERSION_KEY = 'store:category_version'
+PRODUCT_KEY = 'store:product:%s'
+PRODUCT_VERSION_KEY = 'store:product_version:%s'
+SELLER_HEADER_KEY = 'store:seller_header:%s'
+SELLER_HEADER_VERSION_KEY = 'store:seller_header_version:%s'
+
+# Compressed once per catalog version, so the better ratio is worth the CPU
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+ENCODING_PREFERENCE = ('br', 'gzip')
+
+
+def _initial_version():
+    # Seeded from the clock rather than 1, so if the counter is ever evicted
+    # it restarts above every version already used for cache keys.
+    return time.time_ns() // 1000
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter missing (first write, or evicted); any fresh seed is newer
+        cache.add(key, _initial_version(), timeout=None)
+
+
+def get_catalog_version():
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def get_catalog_last_modified():
+    modified = cache.get(CATALOG_MODIFIED_KEY)
+    if modified is None:
+        # Unknown (evicted): claim "now" so clients re-download rather than
+        # risk a 304 for a catalog that did change.
+        cache.add(CATALOG_MODIFIED_KEY, timezone.now(), timeout=None)
+        modified = cache.get(CATALOG_MODIFIED_KEY)
+    return modified
+
+
+def bump_catalog_version():
+    _bump_version(CATALOG_VERSION_KEY)
+    cache.set(CATALOG_MODIFIED_KEY, timezone.now(), timeout=None)
+
+
+def get_category_version():
+    """Version of the Category table, which workers keep in memory (store/categories.py)"""
+    return _get_version(CATEGORY_VERSION_KEY)
+
+
+def bump_category_version():
+    _bump_version(CATEGORY_VERSION_KEY)
+
+
+def replica_may_lag():
+    """Whether this request's reads may miss the latest catalog write"""
+    if not reading_from_replica():
+        return False
+    window = timedelta(seconds=settings.DATABASE_REPLICA_STICKY_SECONDS)
+    return timezone.now() - get_catalog_last_modified() < window
+
+
+def _get_versioned(key, version_key):
+    values = cache.get_many([key, version_key])
+    version = values.get(version_key)
+    if version is None:
+        version = _get_version(version_key)
+    entry = values.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1], version
+    return None, version
+
+
+def _set_versioned(key, version, data):
+    if replica_may_lag():
+        return
+    cache.set(key, (version, data), settings.STORE_CACHE_TIMEOUT)
+
+
+def get_cached_product(pk):
+    """Return (cached data or None, version); a fresh read is stored under that version"""
+    return _get_versioned(PRODUCT_KEY % pk, PRODUCT_VERSION_KEY % pk)
+
+
+def set_cached_product(pk, data, version):
+    _set_versioned(PRODUCT_KEY % pk, version, data)
+
+
+def invalidate_products(pks):
+    """Drop the per-product cache entries for ``pks``"""
+    # Dropping the version too reseeds it above every version already handed out
+    keys = [key % pk for pk in pks for key in (PRODUCT_KEY, PRODUCT_VERSION_KEY)]
+    if keys:
+        cache.delete_many(keys)
+
+
+def get_cached_seller_header(pk):
+    """Return (cached header or None, version); a fresh header is stored under that version"""
+    return _get_versioned(SELLER_HEADER_KEY % pk, SELLER_HEADER_VERSION_KEY % pk)
+
+
+def set_cached_seller_header(pk, data, version):
+    _set_versioned(SELLER_HEADER_KEY % pk, version, data)
+
+
+def invalidate_seller_header(pk):
+    cache.delete_many([SELLER_HEADER_KEY % pk, SELLER_HEADER_VERSION_KEY % pk])
+
+
+def _request_digest(request):
+    query = '&'.join(
+        '%s=%s' % (name, ','.join(request.GET.getlist(name))) for name in sorted(request.GET)
+    )
+    # The Accept header picks the renderer, and image URLs are absolute (built
+    # from the scheme and host), so both are part of the response identity
+    fingerprint = '%s://%s%s?%s|%s' % (
+        request.scheme, request.get_host(), request.path, query, request.META.get('HTTP_ACCEPT', ''),
+    )
+    return hashlib.md5(fingerprint.encode()).hexdigest()
+
+
+def response_cache_key(prefix, request):
+    """Cache key for the encoded response to ``request``; the entry records its own version"""
+    return 'store:response:%s:%s' % (prefix, _request_digest(request))
+
+
+def catalog_etag(request, *args, **kwargs):
+    """Strong ETag for a catalog read: the catalog version plus the request identity"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return '"%s-%s"' % (get_catalog_version(), _request_digest(request))
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_catalog_last_modified()
+
+
+# Answers If-None-Match / If-Modified-Since with a 304 before the view runs
+conditional_catalog_response = condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+
+
+def _encode_variants(content):
+    """The body in every content coding a client may ask for"""
+    variants = {'identity': content}
+    if len(content) >= settings.STORE_CACHE_COMPRESS_MIN_BYTES:
+        # mtime=0 keeps the bytes identical for identical content
+        variants['gzip'] = gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+        if brotli is not None:
+            variants['br'] = brotli.compress(content, quality=BROTLI_QUALITY)
+    return variants
+
+
+def _preferred_encoding(request, variants):
+    """The stored content coding to send for the request's Accept-Encoding"""
+    accepted = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for coding in ENCODING_PREFERENCE:
+        if coding in variants and accepted.get(coding, accepted.get('*', 0)) > 0:
+            return coding
+    return 'identity'
+
+
+def _store_response(request, key, response, version, modified):
+    """Cache the rendered response's encoded bodies; returns the entry, or None if not cacheable"""
+    if response.status_code != 200 or response.streaming or replica_may_lag():
+        return None
+    # The browsable API page shows the logged-in user, so it can't be shared
+    renderer = getattr(response, 'accepted_renderer', None)
+    if renderer is not None and renderer.format == 'api':
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    etag = '"%s-%s"' % (version, _request_digest(request))
+    entry = (version, time.time(), modified, etag, response['Content-Type'], _encode_variants(response.content))
+    # Kept past its freshness so it can still be served stale
+    cache.set(key, entry, settings.STORE_CACHE_TIMEOUT + settings.STORE_CACHE_STALE_SECONDS)
+    return entry
+
+
+def _cached_response(request, entry):
+    _, _, modified, etag, content_type, variants = entry
+    coding = _preferred_encoding(request, variants)
+    response = HttpResponse(variants[coding], content_type=content_type)
+    patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+    if coding != 'identity':
+        response['Content-Encoding'] = coding
+        # Compressed bytes differ from the identity ones; a weak ETag still
+        # matches catalog_etag() in If-None-Match (as with GZipMiddleware)
+        etag = 'W/' + etag
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified.timestamp())
+    return response
+
+
+def _refresh_in_background(view, request, args, kwargs, key, lock_key):
+    def refresh():
+        try:
+            version, modified = get_catalog_version(), get_catalog_last_modified()
+            _store_response(request, key, view(request, *args, **kwargs), version, modified)
+        finally:
+            cache.delete(lock_key)
+            # Connections opened by this thread would otherwise never be closed
+            connections.close_all()
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def _wait_for_entry(key, lock_key, version):
+    # Another request holds the lock and is rendering this response; poll for
+    # its result until the lock is released or expires
+    deadline = time.monotonic() + settings.STORE_CACHE_LOCK_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.025)
+        found = cache.get_many([key, lock_key])
+        entry = found.get(key)
+        if entry is not None and entry[0] == version:
+            return entry
+        if lock_key not in found:
+            # Released without storing a response (error, or not cacheable)
+            break
+    return None
+
+
+def cache_catalog_response(prefix):
+    """
+    Cache successful GET responses of a DRF view, stamped with the catalog version.
+
+    The encoded bytes are stored, so a hit skips the queries, the serializer,
+    the renderer and compression. Stale entries are served while one request re-renders
+    them in the background, and concurrent misses wait for a single render.
+    Other methods and non-200 responses pass straight through.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            key = response_cache_key(prefix, request)
+            lock_key = key + ':lock'
+            lock_timeout = settings.STORE_CACHE_LOCK_SECONDS
+            version = get_catalog_version()
+            entry = cache.get(key)
+
+            # An entry from an older catalog version is never served: the
+            # client may be reading back its own write
+            if entry is not None and entry[0] == version:
+                age = time.time() - entry[1]
+                if age < settings.STORE_CACHE_TIMEOUT:
+                    return _cached_response(request, entry)
+                # Merely expired. Without the lock every request would start
+                # its own refresh
+                if lock_timeout and age < settings.STORE_CACHE_TIMEOUT + settings.STORE_CACHE_STALE_SECONDS:
+                    if cache.add(lock_key, 1, lock_timeout):
+                        _refresh_in_background(view, request, args, kwargs, key, lock_key)
+                    return _cached_response(request, entry)
+
+            locked = False
+            if lock_timeout:
+                locked = cache.add(lock_key, 1, lock_timeout)
+                if not locked:
+                    entry = _wait_for_entry(key, lock_key, version)
+                    if entry is not None:
+                        return _cached_response(request, entry)
+                    # The other render failed or is too slow; do it here
+
+            try:
+                modified = get_catalog_last_modified()
+                response = view(request, *args, **kwargs)
+                entry = _store_response(request, key, response, version, modified)
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+            # Served from the entry so even the first response is compressed
+            return response if entry is None else _cached_response(request, entry)
+        return wrapped
+    return decorator
@@ -0,0 +1,32 @@
+"""
+Process-local read-through cache of the Category table.
+
+The table is tiny and read on every product listing page and product
+create, so each worker keeps a copy in memory. Each read checks the shared
+category version (store/cache.py), which Category save/delete bumps, and
+reloads the table when it has moved on. A read costs one cache lookup and
+no database query.
+"""
+from .cache import get_category_version, replica_may_lag
+from .models import Category
+
+_cached = (None, {})
+
+
+def get_categories():
+    """Category ID -> Category, current as of the shared category version. Treat as read-only."""
+    global _cached
+    version = get_category_version()
+    cached_version, categories = _cached
+    if cached_version != version:
+        categories = {}
+        for category in Category.objects.all():
+            categories[category.pk] = category
+        # Loaded from a replica that may be behind: use it, but reload next time
+        _cached = (None if replica_may_lag() else version, categories)
+    return categories
+
+
+def get_category(pk):
+    """The Category with this ID, or None"""
+    return get_categories().get(pk)
@@ -0,0 +1,106 @@
+"""
+Delta sync: what changed in the catalog since a client's last sync.
+
+Upserts are walked in (updated_at, id) order and deletions in tombstone id
+order. The resume token records how far each walk got, so a client can
+page through a long backlog and later continue from exactly where it
+stopped.
+
+Rows younger than STORE_CHANGES_SETTLE_SECONDS are held back. A write
+stamped before a commit that lands later could otherwise slip behind a
+token that has already moved past its timestamp.
+"""
+import base64
+import binascii
+import json
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .models import ProductTombstone
+from .pagination import keyset_filter
+
+CHANGES_ORDERING = ('updated_at', 'id')
+
+
+def encode_token(upsert_position, tombstone_id):
+    payload = {
+        'u': [upsert_position[0].isoformat(), upsert_position[1]] if upsert_position else None,
+        'd': tombstone_id,
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        upsert_position = payload['u']
+        if upsert_position is not None:
+            updated_at = parse_datetime(upsert_position[0])
+            if updated_at is None:
+                raise ValueError(upsert_position[0])
+            upsert_position = (updated_at, int(upsert_position[1]))
+        tombstone_id = int(payload['d'])
+    except (ValueError, KeyError, TypeError, IndexError, binascii.Error):
+        raise ValidationError({'cursor': 'Invalid resume token.'})
+    return upsert_position, tombstone_id
+
+
+def starting_position(since):
+    """Positions for a first sync: everything changed at or after ``since``, or the whole catalog"""
+    if since is None:
+        # A full download has nothing to delete; start deletions from now on
+        latest = ProductTombstone.objects.aggregate(latest=Max('id'))['latest']
+        return None, latest or 0
+
+    before = ProductTombstone.objects.filter(deleted_at__lt=since).aggregate(latest=Max('id'))['latest']
+    # (since, 0) sorts before every product updated at exactly ``since``
+    return (since, 0), before or 0
+
+
+def parse_since(value):
+    since = parse_datetime(value)
+    if since is None:
+        raise ValidationError({'since': 'Must be an ISO 8601 timestamp.'})
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+
+def catalog_changes(queryset, upsert_position, tombstone_id, page_size):
+    """
+    Return (upsert rows, deleted product ids, next token, has_more).
+
+    ``queryset`` is a values() queryset of products that must include the
+    ``updated_at`` and ``id`` columns.
+    """
+    settled = timezone.now() - timedelta(seconds=settings.STORE_CHANGES_SETTLE_SECONDS)
+
+    upserts = queryset.filter(updated_at__lt=settled).order_by(*CHANGES_ORDERING)
+    if upsert_position is not None:
+        upserts = upserts.filter(keyset_filter(CHANGES_ORDERING, upsert_position))
+    upserts = list(upserts[:page_size + 1])
+
+    tombstones = list(
+        ProductTombstone.objects.filter(id__gt=tombstone_id, deleted_at__lt=settled)
+        .order_by('id')
+        .values_list('id', 'product_id')[:page_size + 1]
+    )
+
+    has_more = len(upserts) > page_size or len(tombstones) > page_size
+    upserts = upserts[:page_size]
+    tombstones = tombstones[:page_size]
+
+    if upserts:
+        upsert_position = (upserts[-1]['updated_at'], upserts[-1]['id'])
+    if tombstones:
+        tombstone_id = tombstones[-1][0]
+
+    deleted = [product_id for _, product_id in tombstones]
+    return upserts, deleted, encode_token(upsert_position, tombstone_id), has_more
@@ -0,0 +1,130 @@
+"""
+"Frequently bought together" from purchase co-occurrence.
+
+Each ``product_purchase`` row in ActivityHistory is one basket: the products
+listed in ``metadata['product_ids']`` (or the single
+``metadata['product_id']``). The job streams those rows in id order, turns
+each chunk into a sparse basket x product incidence matrix B and accumulates
+C = B.T @ B. The diagonal of C counts each product's purchases, and the rest
+counts how often two products were bought together.
+
+Companions are ranked by lift, C[a, b] * baskets / (C[a, a] * C[b, b]): how
+much more often b is bought with a than chance would predict. Pairs seen
+fewer than ``min_count`` times are ignored, since lift is noisy for rare
+pairs. The top k per product go to ProductCompanion, which
+/store/<id>/bought-together/ reads with one indexed join. Needs numpy and scipy.
+"""
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+
+from users.models import ActivityHistory
+from .models import Product, ProductCompanion
+
+
+def basket_product_ids(metadata):
+    """The product IDs one purchase row covers"""
+    if not isinstance(metadata, dict):
+        return []
+    raw = metadata.get('product_ids')
+    if raw is None:
+        raw = [metadata.get('product_id')]
+    if not isinstance(raw, (list, tuple)):
+        return []
+    product_ids = []
+    for value in raw:
+        try:
+            product_ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return product_ids
+
+
+def cooccurrence_matrix(columns, chunk_size, log=None):
+    """
+    Return (C, basket count) over every purchase row, where ``columns`` maps
+    product ID -> matrix index. Rows are read ``chunk_size`` at a time by
+    primary key, so memory depends on the catalog, not the history length.
+    """
+    size = len(columns)
+    total = sparse.csr_matrix((size, size), dtype=np.int64)
+    baskets = 0
+    last_id = 0
+    while True:
+        rows = list(
+            ActivityHistory.objects.filter(activity_type='product_purchase', id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'metadata')[:chunk_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        basket_rows, basket_columns = [], []
+        for _, metadata in rows:
+            # A product listed twice in one basket still counts once
+            items = {columns[product_id] for product_id in basket_product_ids(metadata) if product_id in columns}
+            if not items:
+                continue
+            basket_rows.extend([baskets] * len(items))
+            basket_columns.extend(items)
+            baskets += 1
+
+        if basket_columns:
+            first = basket_rows[0]
+            incidence = sparse.csr_matrix(
+                (np.ones(len(basket_columns), dtype=np.int64), (np.array(basket_rows) - first, basket_columns)),
+                shape=(baskets - first, size),
+            )
+            total = total + (incidence.T @ incidence).tocsr()
+        if log:
+            log(f'Read purchases up to id {last_id} ({baskets} baskets)')
+    return total, baskets
+
+
+def top_companions(matrix, baskets, k, min_count):
+    """Yield (row, [(column, lift, count), ...]) best lift first, for rows with any companions"""
+    purchases = matrix.diagonal().astype(np.float64)
+    for row in range(matrix.shape[0]):
+        lo, hi = matrix.indptr[row], matrix.indptr[row + 1]
+        columns, counts = matrix.indices[lo:hi], matrix.data[lo:hi]
+        keep = (columns != row) & (counts >= min_count)
+        columns, counts = columns[keep], counts[keep]
+        if not len(columns):
+            continue
+        lift = counts * baskets / (purchases[row] * purchases[columns])
+        if len(lift) > k:
+            best = np.argpartition(-lift, k)[:k]
+            columns, counts, lift = columns[best], counts[best], lift[best]
+        # Highest lift first; more evidence, then the lower ID, breaks ties
+        order = np.lexsort((columns, -counts, -lift))
+        yield row, list(zip(columns[order].tolist(), lift[order].tolist(), counts[order].tolist()))
+
+
+def compute_bought_together(k=10, min_count=2, chunk_size=50000, log=None):
+    """Rebuild ProductCompanion from the whole purchase history; returns how many products got companions"""
+    product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+    columns = {product_id: index for index, product_id in enumerate(product_ids)}
+    matrix, baskets = cooccurrence_matrix(columns, chunk_size, log=log)
+    matrix.sort_indices()
+
+    companions = []
+    products = 0
+    for row, best in top_companions(matrix, baskets, k, min_count):
+        products += 1
+        companions.extend(
+            ProductCompanion(
+                product_id=product_ids[row],
+                companion_id=product_ids[column],
+                rank=rank,
+                lift=round(lift, 6),
+                count=count,
+            )
+            for rank, (column, lift, count) in enumerate(best, start=1)
+        )
+
+    # Swapped in one transaction so readers never see a half-built table
+    with transaction.atomic():
+        ProductCompanion.objects.all().delete()
+        ProductCompanion.objects.bulk_create(companions, batch_size=5000)
+    return products
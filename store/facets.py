@@ -0,0 +1,60 @@
+"""
+Facet counts for the storefront sidebar, computed with database aggregates.
+"""
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+
+def price_bucket_bounds():
+    """[(min, max), ...] from STORE_PRICE_BUCKETS; the last bucket is open-ended"""
+    edges = sorted(settings.STORE_PRICE_BUCKETS)
+    lower = [0] + edges
+    upper = edges + [None]
+    return list(zip(lower, upper))
+
+
+def product_facets(queryset):
+    """
+    Count the products in ``queryset`` per category, per price bucket and by
+    discount status. Three grouped queries, whatever the catalog size.
+    """
+    categories = [
+        {'id': row['product_category'], 'category': row['product_category__category'], 'count': row['count']}
+        for row in queryset.order_by()
+        .values('product_category', 'product_category__category')
+        .annotate(count=Count('id'))
+        .order_by('product_category__category')
+    ]
+
+    bounds = price_bucket_bounds()
+    # Label each product with the index of its bucket; products without a price get none
+    bucket = Case(
+        *[When(currtent_price__lt=upper, then=Value(index)) for index, (_, upper) in enumerate(bounds[:-1])],
+        When(currtent_price__isnull=False, then=Value(len(bounds) - 1)),
+        output_field=IntegerField(),
+    )
+    bucket_counts = {
+        row['bucket']: row['count']
+        for row in queryset.order_by()
+        .annotate(bucket=bucket)
+        .values('bucket')
+        .annotate(count=Count('id'))
+    }
+    price_ranges = [
+        {'min': lower, 'max': upper, 'count': bucket_counts.get(index, 0)}
+        for index, (lower, upper) in enumerate(bounds)
+    ]
+
+    discount_counts = {
+        row['is_discounted']: row['count']
+        for row in queryset.order_by().values('is_discounted').annotate(count=Count('id'))
+    }
+
+    return {
+        'categories': categories,
+        'price_ranges': price_ranges,
+        'discount': {
+            'discounted': discount_counts.get(True, 0),
+            'full_price': discount_counts.get(False, 0),
+        },
+    }
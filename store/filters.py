@@ -0,0 +1,101 @@
+"""
+Server-side filtering for product listings.
+
+Every filter here maps onto an index declared on ``Product.Meta`` so the
+listing stays an index range scan whichever combination a client sends.
+"""
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+
+TRUE_VALUES = ('true', '1', 'yes')
+FALSE_VALUES = ('false', '0', 'no')
+
+# Range of a BigAutoField; larger values overflow the database driver
+MIN_ID = -2 ** 63
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_id_list(raw, name):
+    """Parse a comma-separated string (or, from a JSON body, a list) of IDs"""
+    if isinstance(raw, str):
+        raw = raw.split(',')
+    if not isinstance(raw, (list, tuple)):
+        raise ValidationError({name: 'Must be an ID or a comma-separated list of IDs.'})
+    try:
+        ids = [int(value) for value in raw if value != '']
+    except (ValueError, TypeError):
+        raise ValidationError({name: 'Must be an ID or a comma-separated list of IDs.'})
+    if any(not MIN_ID <= value <= MAX_ID for value in ids):
+        raise ValidationError({name: 'IDs must be between %d and %d.' % (MIN_ID, MAX_ID)})
+    return ids
+
+
+def _parse_ids(params, name):
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    return parse_id_list(raw, name)
+
+
+def _parse_price(params, name):
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        price = Decimal(raw)
+    except InvalidOperation:
+        raise ValidationError({name: 'Must be a number.'})
+    if not price.is_finite() or price < 0:
+        raise ValidationError({name: 'Must be a positive number.'})
+    return price
+
+
+def _parse_bool(params, name):
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    if raw.lower() in TRUE_VALUES:
+        return True
+    if raw.lower() in FALSE_VALUES:
+        return False
+    raise ValidationError({name: 'Must be true or false.'})
+
+
+def filter_products(queryset, params):
+    """
+    Narrow a Product queryset using the catalog query parameters:
+
+    - ``product_category``: category ID, or comma-separated IDs
+    - ``seller``: seller ID, or comma-separated IDs
+    - ``min_price`` / ``max_price``: inclusive bounds on ``currtent_price``
+    - ``is_discounted``: true/false
+    - ``in_stock``: true for ``stock > 0``, false for sold-out products
+    """
+    categories = _parse_ids(params, 'product_category')
+    if categories is not None:
+        queryset = queryset.filter(product_category__in=categories)
+
+    sellers = _parse_ids(params, 'seller')
+    if sellers is not None:
+        queryset = queryset.filter(seller__in=sellers)
+
+    min_price = _parse_price(params, 'min_price')
+    if min_price is not None:
+        queryset = queryset.filter(currtent_price__gte=min_price)
+
+    max_price = _parse_price(params, 'max_price')
+    if max_price is not None:
+        queryset = queryset.filter(currtent_price__lte=max_price)
+
+    is_discounted = _parse_bool(params, 'is_discounted')
+    if is_discounted is not None:
+        queryset = queryset.filter(is_discounted=is_discounted)
+
+    in_stock = _parse_bool(params, 'in_stock')
+    if in_stock is True:
+        queryset = queryset.filter(stock__gt=0)
+    elif in_stock is False:
+        queryset = queryset.filter(stock=0)
+
+    return queryset
@@ -0,0 +1,130 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.cache import cache, caches
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from store.cache import response_cache_key
+from store.models import Product
+
+# (label, STORE_CACHE_STALE_SECONDS, STORE_CACHE_LOCK_SECONDS)
+MODES = [
+    ('no coalescing', 0, 0),
+    ('single-flight', 0, 5),
+    ('stale-while-revalidate', 30, 5),
+]
+
+
+class QueryCounter:
+    """Counts catalog queries on every connection, including ones opened by other threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'store_product' in sql:
+            with self.lock:
+                self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    help = 'Expire a cached catalog page under concurrent load and count the catalog queries each expiry costs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Simultaneous requests after each expiry (default: 32)')
+        parser.add_argument('--rounds', type=int, default=5,
+                            help='Expiries per mode (default: 5)')
+        parser.add_argument('--path', default='/store/?page_size=50',
+                            help='Catalog listing URL to request (default: /store/?page_size=50)')
+
+    def handle(self, *args, **options):
+        if not Product.objects.exists():
+            raise CommandError('The catalog is empty; add some products before benchmarking the cache')
+
+        counter = QueryCounter()
+        connection_created.connect(counter.install)
+        self.stdout.write(f'{options["concurrency"]} concurrent GET {options["path"]} per expiry, '
+                          f'{options["rounds"]} expiries per mode, {caches["default"].__class__.__name__} cache')
+        self.stdout.write(f'{"mode":>24} {"queries/expiry":>15} {"p50":>9} {"p95":>9} {"max":>9}')
+        try:
+            # Every request has to reach the view, whatever ALLOWED_HOSTS says
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for label, stale_seconds, lock_seconds in MODES:
+                    with override_settings(STORE_CACHE_STALE_SECONDS=stale_seconds,
+                                           STORE_CACHE_LOCK_SECONDS=lock_seconds):
+                        self.run(label, counter, options)
+        finally:
+            connection_created.disconnect(counter.install)
+
+    def run(self, label, counter, options):
+        path = options['path']
+        key = response_cache_key('catalog', RequestFactory().get(path))
+        lock_key = key + ':lock'
+
+        queries, latencies = [], []
+        for _ in range(options['rounds']):
+            self.expire(key, path)
+            counter.count = 0
+            latencies.extend(self.stampede(path, options['concurrency']))
+            # A background refresh may still be running; its queries belong to this expiry
+            deadline = time.monotonic() + settings.STORE_CACHE_LOCK_SECONDS
+            while cache.get(lock_key) is not None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            queries.append(counter.count)
+
+        latencies.sort()
+        self.stdout.write(
+            f'{label:>24} {statistics.mean(queries):>15.1f} '
+            f'{statistics.median(latencies) * 1000:>7.1f}ms '
+            f'{latencies[int(len(latencies) * 0.95) - 1] * 1000:>7.1f}ms '
+            f'{latencies[-1] * 1000:>7.1f}ms'
+        )
+
+    def expire(self, key, path):
+        # Age the cached page past STORE_CACHE_TIMEOUT, as if it had sat there that long
+        entry = cache.get(key)
+        if entry is None:
+            Client().get(path)
+            entry = cache.get(key)
+        if entry is None:
+            raise CommandError(f'{path} is not served from the catalog response cache')
+        version, stored_at, *rest = entry
+        cache.set(key, (version, stored_at - settings.STORE_CACHE_TIMEOUT, *rest))
+
+    def stampede(self, path, concurrency):
+        barrier = threading.Barrier(concurrency)
+        latencies = []
+        failures = []
+
+        def worker():
+            client = Client()
+            try:
+                barrier.wait()
+                started = time.perf_counter()
+                response = client.get(path)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if failures:
+            raise CommandError(f'{len(failures)} requests failed (status {failures[0]})')
+        return latencies
@@ -0,0 +1,97 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from store.models import Category, Product
+from store.serializer import ProductRowSerializer, ProductSerializer
+from users.models import Seller
+
+
+class RollbackBenchmark(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare ProductSerializer with the ProductRowSerializer fast path on synthetic catalogs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Catalog sizes to benchmark (default: 1000 10000 100000)')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per size; the best time is reported (default: 3)')
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        repeat = options['repeat']
+        # Absolute image URLs are part of the output, so serialize against a request
+        request = RequestFactory().get('/store/')
+
+        self.stdout.write('Benchmark products are created in a transaction that is rolled back afterwards.')
+        self.stdout.write(f'{"products":>10} {"serializer":>12} {"fast path":>12} {"speedup":>9}')
+        try:
+            # The request's host is testserver, whatever ALLOWED_HOSTS says
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), transaction.atomic():
+                self.run(sizes, repeat, request)
+                raise RollbackBenchmark
+        except RollbackBenchmark:
+            pass
+
+    def run(self, sizes, repeat, request):
+        seller = Seller.objects.create(Sellername='Benchmark Seller', email='benchmark-seller@example.com')
+        category = Category.objects.create(category='Benchmark Category')
+        renderer = JSONRenderer()
+        created = 0
+
+        for size in sizes:
+            # bulk_create skips the save signals, so the search index and cache are untouched
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        Productname=f'Benchmark product {index}',
+                        product_description='Benchmark description ' * 20,
+                        initial_price=100 + index % 50,
+                        currtent_price=80 + index % 50,
+                        discount=20,
+                        is_discounted=True,
+                        product_image=f'productimages/benchmark{index}.jpg',
+                        stock=index % 7,
+                        seller=seller,
+                        product_category=category,
+                    )
+                    for index in range(created, size)
+                ],
+                batch_size=2000,
+            )
+            created = size
+            queryset = Product.objects.filter(seller=seller).order_by('-posted_at', '-id')
+
+            def serializer_path():
+                return renderer.render(ProductSerializer(queryset, many=True, context={'request': request}).data)
+
+            def fast_path():
+                rows = ProductRowSerializer(context={'request': request})
+                return renderer.render(rows.to_representation(rows.values(queryset)))
+
+            slow_time, slow_body = self.best_of(serializer_path, repeat)
+            fast_time, fast_body = self.best_of(fast_path, repeat)
+            if slow_body != fast_body:
+                raise CommandError(f'Fast path output differs from ProductSerializer at {size} products')
+
+            self.stdout.write(
+                f'{size:>10} {slow_time * 1000:>10.1f}ms {fast_time * 1000:>10.1f}ms {slow_time / fast_time:>8.1f}x'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Both paths produced byte-identical JSON at every size!'))
+
+    def best_of(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, body
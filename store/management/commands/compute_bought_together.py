@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from store.cooccurrence import compute_bought_together
+
+class Command(BaseCommand):
+    help = 'Rebuild the "frequently bought together" companions from the purchase history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10,
+                            help='Companions stored per product (default: 10)')
+        parser.add_argument('--min-count', type=int, default=2,
+                            help='Ignore pairs bought together fewer times than this (default: 2)')
+        parser.add_argument('--chunk-size', type=int, default=50000,
+                            help='Purchase rows read per pass (default: 50000)')
+
+    def handle(self, *args, **options):
+        products = compute_bought_together(
+            k=options['top_k'],
+            min_count=options['min_count'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Bought-together companions stored for {products} products!'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from store.models import SimilarityRun
+from store.similarity import compute_similar_products
+
+class Command(BaseCommand):
+    help = 'Compute the "similar items" of products changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10,
+                            help='Neighbours stored per product and scope (default: 10)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Products scored per sparse matrix product and transaction (default: 500)')
+        parser.add_argument('--full', action='store_true',
+                            help='Re-score every product, not just the ones changed since the last run')
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        last_run = SimilarityRun.objects.order_by('-started_at').first()
+        changed_since = None if options['full'] or last_run is None else last_run.started_at
+
+        if changed_since is None:
+            self.stdout.write('Scoring the whole catalog')
+        else:
+            self.stdout.write(f'Scoring products changed since {changed_since}')
+
+        scored = compute_similar_products(
+            changed_since=changed_since,
+            k=options['top_k'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        )
+        SimilarityRun.objects.create(started_at=started_at, products_scored=scored)
+        self.stdout.write(self.style.SUCCESS(f'Similar products computed for {scored} products!'))
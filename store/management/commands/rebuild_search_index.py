@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from store.models import Product
+from store import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of products to reindex per transaction (default: 1000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        total = 0
+
+        # Walk the table by primary key so each batch is an index range scan
+        while True:
+            ids = list(
+                Product.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                search.index_products(ids)
+            last_id = ids[-1]
+            total += len(ids)
+            self.stdout.write(f'Indexed {total} products (up to id {last_id})')
+
+        search.remove_orphans()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {total} products!'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from store.trending import prune_buckets, update_trending
+
+class Command(BaseCommand):
+    help = 'Fold new product views and purchases into the trending scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Activity rows counted per transaction (default: 5000)')
+
+    def handle(self, *args, **options):
+        total = update_trending(batch_size=options['batch_size'], log=self.stdout.write)
+        pruned = prune_buckets()
+        self.stdout.write(self.style.SUCCESS(
+            f'Trending updated from {total} new activity rows ({pruned} old hourly counts pruned)!'
+        ))
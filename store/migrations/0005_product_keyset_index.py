@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_alter_product_currtent_price_and_more'),
+        ('users', '0002_remove_user_profile_picture_user_avatar_user_bio_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-posted_at', '-id'], name='product_posted_at_id_idx'),
+        ),
+    ]
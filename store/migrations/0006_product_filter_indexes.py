@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_product_keyset_index'),
+        ('users', '0002_remove_user_profile_picture_user_avatar_user_bio_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_category', '-posted_at', '-id'], name='product_category_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['seller', '-posted_at', '-id'], name='product_seller_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['currtent_price', 'id'], name='product_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_discounted', True)), fields=['-posted_at', '-id'], name='product_discounted_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['-posted_at', '-id'], name='product_in_stock_posted_idx'),
+        ),
+    ]
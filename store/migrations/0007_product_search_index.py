@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# Kept in step with store/search.py, but duplicated here so the migration
+# doesn't depend on application code that may change later.
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(\"Productname\", '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(product_description, '')), 'B')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE store_product ADD COLUMN search_vector tsvector')
+        schema_editor.execute('UPDATE store_product SET search_vector = %s' % PG_SEARCH_VECTOR)
+        schema_editor.execute(
+            'CREATE INDEX store_product_search_vector_idx ON store_product USING GIN (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE store_product_fts USING fts5('
+            '"Productname", product_description, tokenize = \'porter unicode61\')'
+        )
+        schema_editor.execute(
+            'INSERT INTO store_product_fts (rowid, "Productname", product_description) '
+            'SELECT id, "Productname", product_description FROM store_product'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS store_product_search_vector_idx')
+        schema_editor.execute('ALTER TABLE store_product DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS store_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_product_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
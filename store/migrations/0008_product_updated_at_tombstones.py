@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing products were last changed no later than we know of: when posted
+    Product = apps.get_model('store', 'Product')
+    Product.objects.update(updated_at=models.F('posted_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_product_search_index'),
+        ('users', '0002_remove_user_profile_picture_user_avatar_user_bio_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'id'], name='product_updated_at_id_idx'),
+        ),
+    ]
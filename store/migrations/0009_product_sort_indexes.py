@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_product_updated_at_tombstones'),
+        ('users', '0002_remove_user_profile_picture_user_avatar_user_bio_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['discount', 'id'], name='product_discount_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock', 'id'], name='product_stock_id_idx'),
+        ),
+    ]
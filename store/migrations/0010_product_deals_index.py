@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_product_sort_indexes'),
+        ('users', '0002_remove_user_profile_picture_user_avatar_user_bio_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_discounted', True), ('stock__gt', 0)), fields=['-discount', '-id'], name='product_deals_idx'),
+        ),
+    ]
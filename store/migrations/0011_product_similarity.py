@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_product_deals_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+                ('products_scored', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('in_category', models.BooleanField(default=False)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='store.product')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='store.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'in_category', 'rank'), name='product_similarity_rank_uniq')],
+            },
+        ),
+    ]
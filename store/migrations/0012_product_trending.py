@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_product_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductTrendingScore',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='store.product')),
+                ('log_score', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-log_score'], name='product_trending_score_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductActivityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('purchases', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_buckets', to='store.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket_start'], name='activity_bucket_start_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'bucket_start'), name='product_activity_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_product_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCompanion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('lift', models.FloatField()),
+                ('count', models.PositiveIntegerField(help_text='Purchases containing both products')),
+                ('companion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='companion_of', to='store.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='companions', to='store.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'rank'), name='product_companion_rank_uniq')],
+            },
+        ),
+    ]
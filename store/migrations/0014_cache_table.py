@@ -0,0 +1,20 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # The shared cache falls back to a database table when REDIS_URL isn't
+    # set; creating it here means `migrate` alone leaves a working deploy.
+    # Does nothing for other cache backends or when the table already exists.
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_product_companions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
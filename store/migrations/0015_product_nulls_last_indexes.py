@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:40
+
+import store.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_cache_table'),
+        ('users', '0002_remove_user_profile_picture_user_avatar_user_bio_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_discount_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_deals_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=store.models.NullsLastIndex(fields=['-currtent_price', '-id'], name='product_price_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=store.models.NullsLastIndex(fields=['-discount', '-id'], name='product_discount_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=store.models.NullsLastIndex(condition=models.Q(('is_discounted', True), ('stock__gt', 0)), fields=['-discount', '-id'], name='product_deals_idx'),
+        ),
+    ]
@@ -8,6 +8,25 @@ class Category(models.Model):
     def __str__(self):
         return self.category
 
+# An index whose descending columns put NULLs last, as the descending catalog
+# sorts do (see store/pagination.py). PostgreSQL sorts NULL as the largest value,
+# so there NULLS LAST has to be spelled out; SQLite and MySQL sort it as the
+# smallest value and reject NULLS LAST in an index, so plain DESC already matches.
+class NullsLastIndex(models.Index):
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().create_sql(model, schema_editor, using=using, **kwargs)
+        expressions = []
+        for name, order in self.fields_orders:
+            field = model._meta.get_field(name)
+            if order == 'DESC':
+                expressions.append(models.F(name).desc(nulls_last=True) if field.null else models.F(name).desc())
+            else:
+                expressions.append(models.F(name).asc())
+        index = models.Index(*expressions, name=self.name, condition=self.condition)
+        return index.create_sql(model, schema_editor, using=using, **kwargs)
+
+
 # This model represents a product in the market.
 # Products have a name, description, initial price, current price, discount, image, stock, seller, and category.
 # The seller is a foreign key to the Seller model, and the category is a foreign key to the Category model.
@@ -22,12 +41,145 @@ class Product(models.Model):
     seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='sellers')
     is_discounted = models.BooleanField(default=False)
     posted_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     product_category = models.ForeignKey(Category, on_delete=models.SET_NULL, related_name='categories', null=True)
 
+    class Meta:
+        indexes = [
+            # Serves the default catalog order and its keyset pagination
+            models.Index(fields=['-posted_at', '-id'], name='product_posted_at_id_idx'),
+            # Catalog filters, each keeping the default order so a filtered page is still a range scan
+            models.Index(fields=['product_category', '-posted_at', '-id'], name='product_category_posted_idx'),
+            models.Index(fields=['seller', '-posted_at', '-id'], name='product_seller_posted_idx'),
+            # ?sort=price_asc, and price_desc with products without a price last
+            models.Index(fields=['currtent_price', 'id'], name='product_price_id_idx'),
+            NullsLastIndex(fields=['-currtent_price', '-id'], name='product_price_desc_idx'),
+            models.Index(
+                fields=['-posted_at', '-id'],
+                condition=models.Q(is_discounted=True),
+                name='product_discounted_posted_idx',
+            ),
+            models.Index(
+                fields=['-posted_at', '-id'],
+                condition=models.Q(stock__gt=0),
+                name='product_in_stock_posted_idx',
+            ),
+            # ?sort=discount and ?sort=stock, biggest first
+            NullsLastIndex(fields=['-discount', '-id'], name='product_discount_desc_idx'),
+            models.Index(fields=['stock', 'id'], name='product_stock_id_idx'),
+            # The /store/deals/ feed: only live deals are indexed, biggest discount first
+            NullsLastIndex(
+                fields=['-discount', '-id'],
+                condition=models.Q(is_discounted=True, stock__gt=0),
+                name='product_deals_idx',
+            ),
+            # Walks changed products in order for /store/changes/
+            models.Index(fields=['updated_at', 'id'], name='product_updated_at_id_idx'),
+        ]
 
     def __str__(self):
         return self.Productname
 
+# This model records the id of every deleted product.
+# Clients syncing incrementally from /store/changes/ learn about deletions from it,
+# since the product row itself is gone.
+class ProductTombstone(models.Model):
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Product {self.product_id} deleted at {self.deleted_at}"
+
+# This model stores the precomputed "similar items" of each product.
+# Every product keeps its top neighbours twice: across the whole catalog and within its own category.
+# Rows are written by `manage.py compute_similar_products`; rank 1 is the closest match.
+class ProductSimilarity(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similarities')
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_to')
+    in_category = models.BooleanField(default=False)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'in_category', 'rank'], name='product_similarity_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.similar_id} is #{self.rank} like {self.product_id}"
+
+# This model records each run of the similar products job.
+# The next run only re-scores products that changed after the last one started.
+class SimilarityRun(models.Model):
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(auto_now_add=True)
+    products_scored = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Similarity run at {self.started_at}"
+
+# This model stores the "frequently bought together" companions of each product.
+# Rows are rebuilt by `manage.py compute_bought_together`; rank 1 has the highest lift.
+class ProductCompanion(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='companions')
+    companion = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='companion_of')
+    rank = models.PositiveSmallIntegerField()
+    lift = models.FloatField()
+    count = models.PositiveIntegerField(help_text="Purchases containing both products")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='product_companion_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.companion_id} is #{self.rank} bought with {self.product_id}"
+
+# This model counts the views and purchases of a product per hour.
+# It is filled incrementally from ActivityHistory by `manage.py update_trending`.
+class ProductActivityBucket(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='activity_buckets')
+    bucket_start = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    purchases = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'bucket_start'], name='product_activity_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket_start'], name='activity_bucket_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} at {self.bucket_start}: {self.views} views, {self.purchases} purchases"
+
+# This model holds each product's exponentially decayed activity score.
+# The score is stored as a logarithm relative to a fixed epoch (see store/trending.py),
+# so ordering by it ranks products by current decayed activity without rewriting every row as time passes.
+class ProductTrendingScore(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    log_score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-log_score'], name='product_trending_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.log_score}"
+
+# This model remembers how far a background job has read an append-only table.
+# update_trending stores the last ActivityHistory id it has counted.
+class ActivityCheckpoint(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at {self.last_id}"
+
 # This model represents a seller in the market.
 # Sellers can list products for sale and manage their inventory.
 
@@ -0,0 +1,216 @@
+"""
+Keyset (cursor) pagination for product listings.
+
+Pages are addressed by the ordering values of the last row the client saw
+instead of an OFFSET, so page 500 costs the same single index range scan as
+page 1. Cursors are opaque base64 tokens; clients should pass them back
+unchanged in ``?cursor=``.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+
+# Newest first, with the primary key as a tiebreaker so the order is total.
+DEFAULT_ORDERING = ('-posted_at', '-id')
+
+# Orders accepted in ?sort=. Each one ends in id and is served by an index on
+# Product.Meta, whose NULL placement matches. Rows whose sort key is NULL, e.g.
+# products without a price, always come last; see sql_ordering().
+SORT_ORDERINGS = {
+    'newest': DEFAULT_ORDERING,
+    'price_asc': ('currtent_price', 'id'),
+    'price_desc': ('-currtent_price', '-id'),
+    'discount': ('-discount', '-id'),
+    'stock': ('-stock', '-id'),
+}
+
+# /store/deals/: biggest discount first, served by the partial product_deals_idx
+DEALS_ORDERING = ('-discount', '-id')
+
+
+def get_page_size(request):
+    """Return the requested page size, clamped to STORE_MAX_PAGE_SIZE"""
+    page_size = request.query_params.get('page_size')
+    if page_size is None:
+        return settings.STORE_PAGE_SIZE
+    try:
+        page_size = int(page_size)
+    except ValueError:
+        raise ValidationError({'page_size': 'Must be an integer.'})
+    if page_size < 1:
+        raise ValidationError({'page_size': 'Must be at least 1.'})
+    return min(page_size, settings.STORE_MAX_PAGE_SIZE)
+
+
+def requested_ordering(params):
+    """Return the ordering named by ?sort=, newest first by default"""
+    sort = params.get('sort')
+    if sort in (None, ''):
+        return DEFAULT_ORDERING
+    if sort not in SORT_ORDERINGS:
+        raise ValidationError({'sort': 'Must be one of: %s.' % ', '.join(SORT_ORDERINGS)})
+    return SORT_ORDERINGS[sort]
+
+
+def ordering_columns(ordering=DEFAULT_ORDERING):
+    """Column names a row must carry for its cursor to be built"""
+    return [name.lstrip('-') for name in ordering]
+
+
+def _split_ordering(ordering):
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def _nullable_fields(model, ordering):
+    return {name for name, _ in _split_ordering(ordering) if model._meta.get_field(name).null}
+
+
+def sql_ordering(model, ordering, nulls_first=False):
+    """
+    Return ``ordering`` as order_by() arguments that put NULLs in nullable
+    columns after every value (before them with ``nulls_first``), whatever
+    the database's default, so paginated and unpaginated listings agree.
+    """
+    nullable = _nullable_fields(model, ordering)
+    placement = {'nulls_first': True} if nulls_first else {'nulls_last': True}
+    expressions = []
+    for name, descending in _split_ordering(ordering):
+        if name not in nullable:
+            expressions.append('-' + name if descending else name)
+        elif descending:
+            expressions.append(F(name).desc(**placement))
+        else:
+            expressions.append(F(name).asc(**placement))
+    return expressions
+
+
+def _invert_ordering(ordering):
+    return tuple(name[1:] if name.startswith('-') else '-' + name for name in ordering)
+
+
+def _row_value(row, name):
+    # Rows may be model instances or dicts from values()
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(row, ordering, reverse=False):
+    """Build an opaque cursor pointing just past ``row`` in ``ordering``"""
+    position = [_dump_value(_row_value(row, name)) for name, _ in _split_ordering(ordering)]
+    payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, model, ordering):
+    """Decode a cursor into (position values, reverse flag)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        raw_position = payload['p']
+        reverse = bool(payload['r'])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+
+    fields = _split_ordering(ordering)
+    if not isinstance(raw_position, list) or len(raw_position) != len(fields):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+
+    position = []
+    for (name, _), value in zip(fields, raw_position):
+        field = model._meta.get_field(name)
+        if value is None and not field.null:
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+        try:
+            position.append(field.to_python(value))
+        except DjangoValidationError:
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+    return position, reverse
+
+
+def keyset_filter(ordering, position, nullable=(), nulls_first=False):
+    """
+    Build the "rows strictly after ``position``" predicate for ``ordering``,
+    i.e. the row-value comparison (a, b) > (x, y) spelled out as
+    a > x OR (a = x AND b > y), which the database can answer from a
+    composite index on the ordering columns.
+
+    NULLs in the ``nullable`` columns sort after every value, or before them
+    with ``nulls_first``, matching sql_ordering(). That adds an __isnull step:
+    past a value come the larger values and then the NULLs, and past a NULL
+    only the other NULLs (or, with ``nulls_first``, every value).
+    """
+    fields = _split_ordering(ordering)
+    condition = Q()
+    for index, (name, descending) in enumerate(fields):
+        value = position[index]
+        if value is None:
+            if not nulls_first:
+                continue
+            term = Q(**{'%s__isnull' % name: False})
+        else:
+            term = Q(**{'%s__%s' % (name, 'lt' if descending else 'gt'): value})
+            if name in nullable and not nulls_first:
+                term |= Q(**{'%s__isnull' % name: True})
+        for prior_index, (prior_name, _) in enumerate(fields[:index]):
+            prior_value = position[prior_index]
+            if prior_value is None:
+                term &= Q(**{'%s__isnull' % prior_name: True})
+            else:
+                term &= Q(**{prior_name: prior_value})
+        condition |= term
+    return condition
+
+
+def paginate_queryset(queryset, request, ordering=DEFAULT_ORDERING):
+    """
+    Return one page of ``queryset`` as (rows, next_cursor, previous_cursor).
+
+    Rows are fetched with a single LIMIT page_size + 1 query; the extra row
+    only tells us whether another page exists.
+    """
+    page_size = get_page_size(request)
+    token = request.query_params.get('cursor')
+    position, reverse = (None, False)
+    if token:
+        position, reverse = decode_cursor(token, queryset.model, ordering)
+
+    # NULL sort keys form a trailing segment; scanning backwards it comes first
+    scan_ordering = _invert_ordering(ordering) if reverse else ordering
+    queryset = queryset.order_by(*sql_ordering(queryset.model, scan_ordering, nulls_first=reverse))
+    if position is not None:
+        nullable = _nullable_fields(queryset.model, ordering)
+        queryset = queryset.filter(keyset_filter(scan_ordering, position, nullable, nulls_first=reverse))
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    # Scanning forwards, the extra row means there is a next page and a cursor
+    # means there is a previous one; scanning backwards it is the other way round.
+    has_next, has_previous = (position is not None, has_more) if reverse else (has_more, position is not None)
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = encode_cursor(rows[-1], ordering)
+        if has_previous:
+            previous_cursor = encode_cursor(rows[0], ordering, reverse=True)
+    return rows, next_cursor, previous_cursor
@@ -0,0 +1,120 @@
+"""
+Full-text product search over ``Productname`` and ``product_description``.
+
+The index lives next to the product table rather than on the model:
+
+- PostgreSQL: a weighted ``search_vector`` tsvector column on store_product
+  with a GIN index (name weighted above description).
+- SQLite: an FTS5 shadow table, store_product_fts, whose rowid is the
+  product id.
+
+Both are created by migration 0007, kept in sync from the Product signals in
+store/signals.py and can be rebuilt with ``manage.py rebuild_search_index``.
+Other databases fall back to an unranked ``icontains`` scan.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product
+
+FTS_TABLE = 'store_product_fts'
+
+# Expression that (re)computes a product's tsvector from its own columns
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(\"Productname\", '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(product_description, '')), 'B')"
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _placeholders(ids):
+    return ', '.join(['%s'] * len(ids))
+
+
+def index_products(ids):
+    """Refresh the search index entries for the given product IDs"""
+    ids = list(ids)
+    if not ids:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'UPDATE store_product SET search_vector = %s WHERE id IN (%s)' % (PG_SEARCH_VECTOR, _placeholders(ids)),
+                ids,
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute('DELETE FROM %s WHERE rowid IN (%s)' % (FTS_TABLE, _placeholders(ids)), ids)
+            cursor.execute(
+                'INSERT INTO %s (rowid, "Productname", product_description) '
+                'SELECT id, "Productname", product_description FROM store_product WHERE id IN (%s)'
+                % (FTS_TABLE, _placeholders(ids)),
+                ids,
+            )
+
+
+def remove_products(ids):
+    """Drop index entries for deleted products"""
+    ids = list(ids)
+    # On PostgreSQL the vector is a column of the deleted row, so it is already gone
+    if not ids or connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid IN (%s)' % (FTS_TABLE, _placeholders(ids)), ids)
+
+
+def remove_orphans():
+    """Drop index entries whose product no longer exists"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid NOT IN (SELECT id FROM store_product)' % FTS_TABLE)
+
+
+def _fts5_query(query):
+    # Quote every term so user input can't inject FTS5 syntax, and prefix-match
+    # the last one so partially typed words still hit.
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return None
+    terms = ['"%s"' % token for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_product_ids(query, limit, offset=0):
+    """
+    Return [(product_id, rank), ...] best match first. Ranks are only
+    comparable within one result set; higher is better.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, ts_rank_cd(search_vector, query) AS rank "
+                "FROM store_product, websearch_to_tsquery('english', %s) query "
+                "WHERE search_vector @@ query ORDER BY rank DESC, id DESC LIMIT %s OFFSET %s",
+                [query, limit, offset],
+            )
+            return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+    if connection.vendor == 'sqlite':
+        match = _fts5_query(query)
+        if match is None:
+            return []
+        with connection.cursor() as cursor:
+            # bm25() is lower-is-better; name matches weigh 10x description matches
+            cursor.execute(
+                'SELECT rowid, bm25(%s, 10.0, 1.0) AS rank FROM %s WHERE %s MATCH %%s '
+                'ORDER BY rank, rowid DESC LIMIT %%s OFFSET %%s' % (FTS_TABLE, FTS_TABLE, FTS_TABLE),
+                [match, limit, offset],
+            )
+            return [(row[0], -float(row[1])) for row in cursor.fetchall()]
+
+    ids = (
+        Product.objects.filter(Q(Productname__icontains=query) | Q(product_description__icontains=query))
+        .order_by('-posted_at', '-id')
+        .values_list('id', flat=True)[offset:offset + limit]
+    )
+    return [(product_id, 0.0) for product_id in ids]
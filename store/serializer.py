@@ -1,5 +1,24 @@
+import re
+from operator import itemgetter
+
+from django.core.files.storage import FileSystemStorage
 from .models import Product, Category
+from users.models import Seller
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework.exceptions import ValidationError
 from rest_framework.serializers import ModelSerializer
+from .categories import get_category
+
+
+# Everything the product grid renders; ?view=summary trims list responses to these
+SUMMARY_FIELDS = ('id', 'Productname', 'initial_price', 'currtent_price', 'discount', 'is_discounted', 'product_image')
+
+# ?expand= name -> the product field it replaces with the related object
+EXPANSIONS = {
+    'seller': 'seller',
+    'category': 'product_category',
+}
 
 
 class CategorySerializer(ModelSerializer):
@@ -8,8 +27,247 @@ class CategorySerializer(ModelSerializer):
         fields = '__all__'
 
 
+class CachedCategoryField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField for product_category that validates against the
+    worker's in-memory category table instead of querying it on every write.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        category = get_category(pk)
+        if category is None:
+            self.fail('does_not_exist', pk_value=data)
+        return category
+
+
+class SellerSummarySerializer(ModelSerializer):
+    class Meta:
+        model = Seller
+        fields = ['id', 'Sellername']
+
+
 class ProductSerializer(ModelSerializer):
+    """
+    Accepts two optional arguments:
+
+    - ``fields``: restrict the output to a subset of the product fields,
+      e.g. ProductSerializer(products, many=True, fields=SUMMARY_FIELDS)
+    - ``expand``: names from EXPANSIONS whose IDs are replaced by the related
+      object. select_related() those relations so they are joined instead of
+      fetched once per product.
+
+    Read-only listings should use ProductRowSerializer, which produces the
+    same output much faster.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', ())
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if 'seller' in expand and 'seller' in self.fields:
+            self.fields['seller'] = SellerSummarySerializer(read_only=True)
+        if 'category' in expand and 'product_category' in self.fields:
+            self.fields['product_category'] = CategorySerializer(read_only=True)
+
+    def build_relational_field(self, field_name, relation_info):
+        field_class, field_kwargs = super().build_relational_field(field_name, relation_info)
+        if field_name == 'product_category':
+            field_class = CachedCategoryField
+        return field_class, field_kwargs
+
     class Meta:
         model = Product
         fields = '__all__'
-        read_only_fields = ['posted_at', 'is_discounted']
\ No newline at end of file
+        read_only_fields = ['posted_at', 'is_discounted']
+
+
+def requested_product_fields(params):
+    """
+    Resolve ``?fields=`` / ``?view=summary`` into the product fields to return,
+    or None for the full representation. ``fields`` wins when both are given.
+    """
+    fields = params.get('fields')
+    if fields:
+        requested = [name.strip() for name in fields.split(',') if name.strip()]
+        available = ProductSerializer().fields
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ValidationError({'fields': 'Unknown product fields: %s.' % ', '.join(unknown)})
+        return tuple(requested)
+
+    view = params.get('view')
+    if view in (None, '', 'full'):
+        return None
+    if view == 'summary':
+        return SUMMARY_FIELDS
+    raise ValidationError({'view': 'Must be "summary" or "full".'})
+
+
+def requested_expansions(params):
+    """Resolve ``?expand=seller,category`` into a tuple of expansion names"""
+    expand = params.get('expand')
+    if not expand:
+        return ()
+    requested = tuple(name.strip() for name in expand.split(',') if name.strip())
+    unknown = [name for name in requested if name not in EXPANSIONS]
+    if unknown:
+        raise ValidationError({'expand': 'Unknown expansions: %s.' % ', '.join(unknown)})
+    return requested
+
+
+# DRF fields whose to_representation() is the identity for values() output
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.BooleanField,
+    serializers.ReadOnlyField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+# Stored file names that URL-quoting and urljoin() leave untouched: plain
+# path segments, none of them starting with a dot
+PLAIN_FILE_NAME_RE = re.compile(r'^[\w\-][\w.\-]*(?:/[\w\-][\w.\-]*)*$', re.ASCII)
+
+
+class ProductRowSerializer:
+    """
+    Read-only fast path for product listings.
+
+    Builds the exact output of ProductSerializer(fields=, expand=) straight from
+    ``values()`` rows, skipping model instantiation and DRF's per-field
+    attribute lookups. The per-field converters are derived from a
+    ProductSerializer instance, so the two stay in step when the model changes.
+
+        rows = ProductRowSerializer(fields, expand, context={'request': request})
+        data = rows.to_representation(rows.values(queryset))
+    """
+
+    def __init__(self, fields=None, expand=(), context=None):
+        template = ProductSerializer(fields=fields, expand=expand, context=context or {})
+        request = template.context.get('request')
+        self.columns = []
+        self._converters = []
+
+        for name, field in template.fields.items():
+            if isinstance(field, SellerSummarySerializer):
+                self._add_nested(name, 'seller', ('id', 'Sellername'))
+            elif isinstance(field, CategorySerializer):
+                self._add_nested(name, 'product_category', ('id', 'category'))
+            elif isinstance(field, serializers.FileField):
+                self.columns.append(name)
+                self._converters.append((name, self._file_url(name, request)))
+            elif isinstance(field, serializers.DecimalField):
+                self.columns.append(name)
+                self._converters.append((name, self._decimal(name, field)))
+            elif isinstance(field, serializers.DateTimeField):
+                self.columns.append(name)
+                self._converters.append((name, self._datetime(name, field)))
+            elif isinstance(field, PASSTHROUGH_FIELDS):
+                self.columns.append(name)
+                self._converters.append((name, itemgetter(name)))
+            else:
+                self.columns.append(name)
+                self._converters.append((name, self._convert(name, field.to_representation)))
+
+    def _add_nested(self, name, relation, related_fields):
+        columns = ['%s__%s' % (relation, related) for related in related_fields]
+        self.columns.append(relation)
+        self.columns.extend(columns)
+
+        def nested(row):
+            # Serializers render a missing relation as None, not as an empty object
+            if row[relation] is None:
+                return None
+            return {related: row[column] for related, column in zip(related_fields, columns)}
+        self._converters.append((name, nested))
+
+    @staticmethod
+    def _file_url(name, request):
+        storage = Product._meta.get_field(name).storage
+        # For local storage a plain file name just gets appended to MEDIA_URL,
+        # so resolve that prefix once instead of urljoin()-ing every row
+        prefix = None
+        if isinstance(storage, FileSystemStorage) and storage.base_url:
+            prefix = request.build_absolute_uri(storage.base_url) if request is not None else storage.base_url
+
+        def file_url(row):
+            value = row[name]
+            if not value:
+                return None
+            if prefix is not None and PLAIN_FILE_NAME_RE.match(value):
+                return prefix + value
+            url = storage.url(value)
+            return request.build_absolute_uri(url) if request is not None else url
+        return file_url
+
+    @classmethod
+    def _decimal(cls, name, field):
+        places = field.decimal_places
+        plain_strings = (
+            getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            and not field.localize
+            and not field.normalize_output
+            and places
+        )
+        if not plain_strings:
+            return cls._convert(name, field.to_representation)
+        to_representation = field.to_representation
+
+        def decimal(row):
+            value = row[name]
+            if value is None:
+                return None
+            # Database values already carry the column's decimal places, which
+            # makes DRF's quantize() a no-op; only fall back when they don't
+            text = '{:f}'.format(value)
+            if text[-places - 1:-places] == '.':
+                return text
+            return to_representation(value)
+        return decimal
+
+    @classmethod
+    def _datetime(cls, name, field):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        # Resolved once per serializer instead of once per row
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+            return cls._convert(name, field.to_representation)
+        to_representation = field.to_representation
+
+        def datetime(row):
+            value = row[name]
+            if value is None:
+                return None
+            # Aware database values only need converting to the field's timezone
+            if value.utcoffset() is None:
+                return to_representation(value)
+            text = value.astimezone(field_timezone).isoformat()
+            if text.endswith('+00:00'):
+                text = text[:-6] + 'Z'
+            return text
+        return datetime
+
+    @staticmethod
+    def _convert(name, to_representation):
+        def convert(row):
+            value = row[name]
+            return None if value is None else to_representation(value)
+        return convert
+
+    def values(self, queryset, extra_columns=()):
+        """``queryset.values()`` selecting the columns this serializer reads plus ``extra_columns``"""
+        columns = self.columns + [column for column in extra_columns if column not in self.columns]
+        return queryset.values(*columns)
+
+    def to_representation(self, rows):
+        converters = self._converters
+        return [{name: convert(row) for name, convert in converters} for row in rows]
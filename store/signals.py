@@ -0,0 +1,107 @@
+"""
+Signal handlers that keep derived store data in step with the catalog.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import Seller
+from .models import Category, Product, ProductTombstone
+from . import search
+from .cache import bump_catalog_version, bump_category_version, invalidate_products, invalidate_seller_header
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, raw=False, **kwargs):
+    # Fixture loading saves rows before related tables exist; the rebuild
+    # command covers that case.
+    if raw:
+        return
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def record_product_tombstone(sender, instance, **kwargs):
+    # Lets incrementally syncing clients (/store/changes/) learn about the deletion
+    ProductTombstone.objects.create(product_id=instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Seller)
+@receiver(post_delete, sender=Seller)
+def invalidate_catalog_cache(sender, **kwargs):
+    # Bump only once the write is visible to other workers; bumping inside the
+    # transaction would let a concurrent reader cache the old rows under the new version.
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_list(sender, **kwargs):
+    transaction.on_commit(bump_category_version)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_detail(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_products, [instance.pk]))
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_seller(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Collected before a save: a product moved to another seller changes both storefront headers
+    instance._previous_seller_id = None
+    if raw or instance.pk is None or (update_fields is not None and 'seller' not in update_fields):
+        return
+    instance._previous_seller_id = Product.objects.filter(pk=instance.pk).values_list('seller_id', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_seller_header(sender, instance, **kwargs):
+    # The storefront header counts the seller's products and their price range
+    for seller_id in {instance.seller_id, getattr(instance, '_previous_seller_id', None)} - {None}:
+        transaction.on_commit(partial(invalidate_seller_header, seller_id))
+
+
+@receiver(post_save, sender=Seller)
+@receiver(post_delete, sender=Seller)
+def invalidate_seller_storefront(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_seller_header, instance.pk))
+
+
+@receiver(post_save, sender=Seller)
+def invalidate_seller_products(sender, instance, **kwargs):
+    # Detail responses embed the seller's name. Deleting a seller deletes its
+    # products, which sends their own signals.
+    product_ids = list(Product.objects.filter(seller=instance).values_list('id', flat=True))
+    transaction.on_commit(partial(invalidate_products, product_ids))
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def invalidate_category_products(sender, instance, **kwargs):
+    # Collected before a delete, since SET_NULL detaches the products without signals
+    product_ids = list(Product.objects.filter(product_category=instance).values_list('id', flat=True))
+    instance._product_ids = product_ids
+    transaction.on_commit(partial(invalidate_products, product_ids))
+
+
+@receiver(post_delete, sender=Category)
+def touch_detached_products(sender, instance, **kwargs):
+    # SET_NULL's bulk UPDATE leaves updated_at alone, so /store/changes/ would
+    # never report the products losing their category
+    product_ids = getattr(instance, '_product_ids', [])
+    if product_ids:
+        Product.objects.filter(id__in=product_ids).update(updated_at=timezone.now())
@@ -0,0 +1,218 @@
+"""
+Content-based "similar items" for product pages.
+
+Each product becomes a TF-IDF vector over the words of its name and
+description (name words count twice), held in a SciPy sparse matrix. Its
+nearest neighbours by cosine similarity are stored in ProductSimilarity,
+once across the whole catalog and once within its own category.
+
+The work happens in ``manage.py compute_similar_products``; the
+/store/<id>/similar/ view only reads the stored rows. Needs numpy and scipy.
+"""
+import re
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+from django.db.models import Count, Min
+
+from .models import Product, ProductSimilarity
+
+NAME_WEIGHT = 2
+
+# Words of two or more letters; numbers and model codes say little about similarity
+TOKEN_RE = re.compile(r'[^\W\d_]{2,}', re.UNICODE)
+
+STOP_WORDS = frozenset('''
+    a an and are as at be but by for from has have in is it its of on or so
+    than that the this to was were will with you your our new best very
+'''.split())
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall((text or '').casefold()) if token not in STOP_WORDS]
+
+
+def product_tokens(name, description):
+    return tokenize(name) * NAME_WEIGHT + tokenize(description)
+
+
+def tfidf_matrix(documents):
+    """
+    CSR matrix with one L2-normalized row per token list, using sublinear term
+    frequency (1 + log tf) and smoothed IDF, so row dot products are cosines.
+    """
+    vocabulary = {}
+    rows, columns, counts = [], [], []
+    for row, tokens in enumerate(documents):
+        term_counts = Counter(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+        rows.extend([row] * len(term_counts))
+        columns.extend(term_counts.keys())
+        counts.extend(term_counts.values())
+
+    shape = (len(documents), max(len(vocabulary), 1))
+    matrix = sparse.csr_matrix((np.array(counts, dtype=np.float64), (rows, columns)), shape=shape)
+    matrix.data = 1.0 + np.log(matrix.data)
+
+    document_frequency = np.bincount(matrix.indices, minlength=shape[1])
+    idf = np.log((1.0 + shape[0]) / (1.0 + document_frequency)) + 1.0
+    matrix = matrix @ sparse.diags(idf)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sparse.diags(1.0 / norms) @ matrix).tocsr()
+
+
+def _top(columns, scores, k):
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k)[:k]
+        columns, scores = columns[keep], scores[keep]
+    # Best score first; ties go to the lower row, so reruns are stable
+    order = np.lexsort((columns, -scores))
+    return list(zip(columns[order].tolist(), scores[order].tolist()))
+
+
+def nearest_neighbours(matrix, rows, categories, k, chunk_size):
+    """
+    Yield (row, catalog neighbours, category neighbours) for each of ``rows``,
+    neighbours being [(row, cosine), ...] best first. ``categories`` holds a
+    category per row, -1 for none. Rows are scored ``chunk_size`` at a time, as
+    one sparse product against the whole matrix.
+    """
+    transposed = matrix.T.tocsc()
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        scores = (matrix[chunk] @ transposed).tocsr()
+        for offset, row in enumerate(chunk):
+            lo, hi = scores.indptr[offset], scores.indptr[offset + 1]
+            columns, values = scores.indices[lo:hi], scores.data[lo:hi]
+            keep = (columns != row) & (values > 0)
+            columns, values = columns[keep], values[keep]
+
+            in_category = []
+            if categories[row] >= 0:
+                same = categories[columns] == categories[row]
+                in_category = _top(columns[same], values[same], k)
+            yield row, _top(columns, values, k), in_category
+
+
+def products_to_rescore(product_ids, changed_ids):
+    """
+    The changed products, plus every product that currently lists one of
+    them as a neighbour (its list may no longer hold), plus products that
+    have never been scored.
+    """
+    targets = set(changed_ids)
+    changed_ids = list(changed_ids)
+    for start in range(0, len(changed_ids), 500):
+        targets.update(
+            ProductSimilarity.objects.filter(similar_id__in=changed_ids[start:start + 500])
+            .values_list('product_id', flat=True)
+        )
+    scored = set(ProductSimilarity.objects.values_list('product_id', flat=True).distinct())
+    targets.update(set(product_ids) - scored)
+    return targets
+
+
+def gained_neighbours(matrix, product_ids, categories, changed_rows, k, chunk_size):
+    """
+    Products whose stored lists a changed product now belongs in. Cosine
+    similarity is symmetric, so scoring the changed rows against the whole
+    matrix shows every product it would now rank for: those where it scores
+    at least as well as the current k-th neighbour, or that list fewer than k.
+    """
+    row_of = {product_id: row for row, product_id in enumerate(product_ids)}
+    # The k-th best stored score per product and scope; 0 while a list is short
+    floors = {False: np.zeros(len(product_ids)), True: np.zeros(len(product_ids))}
+    stored = (
+        ProductSimilarity.objects.filter(rank__lte=k)
+        .values('product_id', 'in_category')
+        .annotate(listed=Count('id'), lowest=Min('score'))
+    )
+    for entry in stored:
+        if entry['listed'] >= k and entry['product_id'] in row_of:
+            floors[entry['in_category']][row_of[entry['product_id']]] = entry['lowest']
+
+    gained = set()
+    transposed = matrix.T.tocsc()
+    for start in range(0, len(changed_rows), chunk_size):
+        chunk = changed_rows[start:start + chunk_size]
+        scores = (matrix[chunk] @ transposed).tocsr()
+        for offset, row in enumerate(chunk):
+            lo, hi = scores.indptr[offset], scores.indptr[offset + 1]
+            columns, values = scores.indices[lo:hi], scores.data[lo:hi]
+            keep = (columns != row) & (values > 0)
+            # Compared as stored, rounded to 6 places
+            columns, values = columns[keep], np.round(values[keep], 6)
+
+            beats = values >= floors[False][columns]
+            if categories[row] >= 0:
+                beats |= (categories[columns] == categories[row]) & (values >= floors[True][columns])
+            gained.update(product_ids[column] for column in columns[beats].tolist())
+    return gained
+
+
+def compute_similar_products(changed_since=None, k=10, chunk_size=500, log=None):
+    """
+    Re-score products and store their neighbours. With ``changed_since``,
+    only products updated since then are re-scored, along with those that
+    listed them or should list them now; otherwise the whole catalog is.
+    Returns how many were scored.
+    """
+    products = list(
+        Product.objects.order_by('id').values_list(
+            'id', 'Productname', 'product_description', 'product_category', 'updated_at'
+        )
+    )
+    if not products:
+        return 0
+
+    product_ids = np.array([product[0] for product in products])
+    categories = np.array([product[3] if product[3] is not None else -1 for product in products])
+    # The vocabulary and IDF always come from the whole catalog, so scores of
+    # re-scored and untouched products stay comparable
+    matrix = tfidf_matrix([product_tokens(product[1], product[2]) for product in products])
+
+    if changed_since is None:
+        rows = list(range(len(products)))
+    else:
+        changed = [product[0] for product in products if product[4] >= changed_since]
+        targets = products_to_rescore(product_ids.tolist(), changed)
+        changed_rows = [row for row, product in enumerate(products) if product[4] >= changed_since]
+        targets |= gained_neighbours(matrix, product_ids.tolist(), categories, changed_rows, k, chunk_size)
+        rows = [row for row, product_id in enumerate(product_ids.tolist()) if product_id in targets]
+
+    scored = 0
+    batch_ids, batch_rows = [], []
+    for row, catalog, category in nearest_neighbours(matrix, rows, categories, k, chunk_size):
+        product_id = int(product_ids[row])
+        batch_ids.append(product_id)
+        for in_category, neighbours in ((False, catalog), (True, category)):
+            batch_rows.extend(
+                ProductSimilarity(
+                    product_id=product_id,
+                    similar_id=int(product_ids[neighbour]),
+                    in_category=in_category,
+                    rank=rank,
+                    score=round(score, 6),
+                )
+                for rank, (neighbour, score) in enumerate(neighbours, start=1)
+            )
+        if len(batch_ids) >= chunk_size:
+            _replace(batch_ids, batch_rows)
+            scored += len(batch_ids)
+            if log:
+                log(f'Scored {scored} of {len(rows)} products')
+            batch_ids, batch_rows = [], []
+
+    if batch_ids:
+        _replace(batch_ids, batch_rows)
+        scored += len(batch_ids)
+    return scored
+
+
+def _replace(product_ids, rows):
+    with transaction.atomic():
+        ProductSimilarity.objects.filter(product_id__in=product_ids).delete()
+        ProductSimilarity.objects.bulk_create(rows)
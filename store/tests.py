@@ -1,3 +1,1063 @@
-from django.test import TestCase
+import base64
+import gzip
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from u_buy.db_router import REPLICA, STICKY_COOKIE
+from u_buy.renderers import ORJSONRenderer, msgpack
+from users.models import ActivityHistory, Seller, User
+from . import autocomplete, categories
+from .cache import (
+    get_cached_product, get_cached_seller_header, response_cache_key, set_cached_product, set_cached_seller_header,
+)
+from .models import Category, Product, ProductSimilarity
+from .serializer import SUMMARY_FIELDS, ProductRowSerializer, ProductSerializer
+from .cooccurrence import compute_bought_together
+from .similarity import compute_similar_products
+from .trending import update_trending
+
+
+def create_products(count, seller, category):
+    return [
+        Product.objects.create(
+            Productname=f'Product {index}',
+            product_description='Description',
+            initial_price=100,
+            currtent_price=80,
+            product_image=f'productimages/product{index}.jpg',
+            seller=seller,
+            product_category=category,
+        )
+        for index in range(count)
+    ]
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        category = Category.objects.create(category='Electronics')
+        create_products(7, seller, category)
+        # Identical timestamps, so pages depend on the id tiebreaker
+        Product.objects.update(posted_at=timezone.now())
+        self.newest_first = list(Product.objects.order_by('-id').values_list('id', flat=True))
+
+    def page(self, query):
+        response = self.client.get('/store/?fields=id&' + query)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [row['id'] for row in body['results']], body['next'], body['previous']
+
+    def test_next_and_previous_cursors_walk_the_whole_catalog(self):
+        ids, cursor, previous = self.page('page_size=3')
+        self.assertIsNone(previous)
+        pages = [ids]
+        while cursor:
+            ids, cursor, previous = self.page(f'page_size=3&cursor={cursor}')
+            self.assertIsNotNone(previous)
+            pages.append(ids)
+        self.assertEqual([len(ids) for ids in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.newest_first)
+
+        # Walking back from the last page yields the same pages in reverse
+        back = []
+        while previous:
+            ids, _, previous = self.page(f'page_size=3&cursor={previous}')
+            back.append(ids)
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_switching_direction_returns_to_the_same_page(self):
+        first, next_cursor, _ = self.page('page_size=3')
+        second, next_cursor, previous = self.page(f'page_size=3&cursor={next_cursor}')
+        ids, forward, backward = self.page(f'page_size=3&cursor={previous}')
+        self.assertEqual(ids, first)
+        self.assertIsNone(backward)
+        self.assertEqual(self.page(f'page_size=3&cursor={forward}')[0], second)
+
+    def test_invalid_cursors_are_rejected(self):
+        wrong_shape = base64.urlsafe_b64encode(b'{"p":[1],"r":false}').decode()
+        wrong_type = base64.urlsafe_b64encode(b'{"p":["soon","x"],"r":false}').decode()
+        null_id = base64.urlsafe_b64encode(b'{"p":["2024-01-01T00:00:00+00:00",null],"r":false}').decode()
+        for cursor in ('not-a-cursor', wrong_shape, wrong_type, null_id):
+            response = self.client.get(f'/store/?cursor={cursor}')
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertIn('cursor', response.json())
+
+    @override_settings(STORE_MAX_PAGE_SIZE=4)
+    def test_page_size_is_clamped_and_validated(self):
+        self.assertEqual(len(self.page('page_size=50')[0]), 4)
+        for page_size in ('0', 'ten'):
+            response = self.client.get(f'/store/?page_size={page_size}')
+            self.assertEqual(response.status_code, 400)
+
+    def test_paginate_false_returns_every_product(self):
+        response = self.client.get('/store/?paginate=false&fields=id')
+        self.assertEqual(sorted(row['id'] for row in response.json()), sorted(self.newest_first))
+
+    def test_products_without_a_price_are_paged_last(self):
+        for price, pk in zip([30, None, 10, None, 20, 10, None], self.newest_first):
+            Product.objects.filter(pk=pk).update(currtent_price=price)
+        for sort in ('price_asc', 'price_desc'):
+            response = self.client.get(f'/store/?paginate=false&fields=id&sort={sort}')
+            unpaginated = [row['id'] for row in response.json()]
+            self.assertEqual(len(unpaginated), 7)
+            self.assertEqual(set(unpaginated[-3:]), {self.newest_first[i] for i in (1, 3, 6)})
+
+            # Forwards through the NULL segment and back again, two rows at a time
+            ids, cursor, previous = self.page(f'sort={sort}&page_size=2')
+            pages = [ids]
+            while cursor:
+                ids, cursor, previous = self.page(f'sort={sort}&page_size=2&cursor={cursor}')
+                pages.append(ids)
+            self.assertEqual(sum(pages, []), unpaginated, sort)
+            back = []
+            while previous:
+                ids, _, previous = self.page(f'sort={sort}&page_size=2&cursor={previous}')
+                back.append(ids)
+            self.assertEqual(back, pages[-2::-1], sort)
+
+
+class ProductFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sellers = [
+            Seller.objects.create(Sellername='Tech Store', email='tech@example.com'),
+            Seller.objects.create(Sellername='Gadget Store', email='gadget@example.com'),
+        ]
+        self.categories = [Category.objects.create(category=name) for name in ('Phones', 'Laptops', 'Tablets')]
+        for name, category, seller, price, is_discounted, stock in [
+            ('Budget phone', 0, 0, 100, True, 3),
+            ('Flagship phone', 0, 1, Decimal('999.99'), False, 0),
+            ('Laptop', 1, 0, 500, True, 0),
+            ('Tablet', 2, 1, 300, False, 1),
+        ]:
+            Product.objects.create(
+                Productname=name, product_description='Description', currtent_price=price,
+                is_discounted=is_discounted, stock=stock,
+                seller=self.sellers[seller], product_category=self.categories[category],
+            )
+
+    def names(self, query):
+        response = self.client.get('/store/?fields=Productname&' + query)
+        self.assertEqual(response.status_code, 200, query)
+        return {row['Productname'] for row in response.json()['results']}
+
+    def test_category_and_seller_take_one_id_or_a_list(self):
+        phones, laptops, tablets = self.categories
+        self.assertEqual(self.names(f'product_category={phones.pk}'), {'Budget phone', 'Flagship phone'})
+        self.assertEqual(self.names(f'product_category={laptops.pk},{tablets.pk}'), {'Laptop', 'Tablet'})
+        self.assertEqual(self.names(f'seller={self.sellers[1].pk}'), {'Flagship phone', 'Tablet'})
+        self.assertEqual(
+            self.names(f'seller={self.sellers[0].pk},{self.sellers[1].pk}&product_category={phones.pk}'),
+            {'Budget phone', 'Flagship phone'},
+        )
+
+    def test_price_bounds_are_inclusive(self):
+        self.assertEqual(self.names('min_price=300&max_price=500'), {'Laptop', 'Tablet'})
+        self.assertEqual(self.names('min_price=999.99'), {'Flagship phone'})
+        self.assertEqual(self.names('max_price=100'), {'Budget phone'})
+
+    def test_discount_and_stock_flags(self):
+        self.assertEqual(self.names('is_discounted=true'), {'Budget phone', 'Laptop'})
+        self.assertEqual(self.names('is_discounted=false'), {'Flagship phone', 'Tablet'})
+        self.assertEqual(self.names('in_stock=true'), {'Budget phone', 'Tablet'})
+        self.assertEqual(self.names('in_stock=false'), {'Flagship phone', 'Laptop'})
+        self.assertEqual(self.names('in_stock=1&is_discounted=yes'), {'Budget phone'})
+
+    def test_bad_values_are_rejected(self):
+        for query in ('product_category=phones', 'seller=1,x', 'min_price=cheap', 'max_price=-5',
+                      'min_price=NaN', 'is_discounted=maybe', 'in_stock=2'):
+            response = self.client.get('/store/?' + query)
+            self.assertEqual(response.status_code, 400, query)
+
+
+class ReadReplicaTests(TestCase):
+    """Routing against a second, separate SQLite database standing in for the replica"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Added once the test databases exist, as the runner would try to set
+        # this one up too; it only lives in memory
+        connections.settings[REPLICA] = connections.configure_settings({
+            'default': connections.settings['default'],
+            REPLICA: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        })[REPLICA]
+        cls.databases = {'default', REPLICA}
+        with connections[REPLICA].schema_editor() as editor:
+            for model in (Seller, Category, Product):
+                editor.create_model(model)
+        # A product only the replica has, so whichever database answered is
+        # visible. bulk_create skips the signals, which would write to the primary
+        seller = Seller(id=1000, Sellername='Replica Store', email='replica@example.com')
+        category = Category(id=1000, category='Lighting')
+        Seller.objects.using(REPLICA).bulk_create([seller])
+        Category.objects.using(REPLICA).bulk_create([category])
+        Product.objects.using(REPLICA).bulk_create([Product(
+            id=1000, Productname='Replica lamp', product_description='Only on the replica',
+            currtent_price=10, seller=seller, product_category=category,
+        )])
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        del cls.databases
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_safe_requests_read_from_the_replica(self):
+        response = self.client.get('/store/batch/?ids=1000&fields=Productname')
+        self.assertEqual(response.json()['results'], [{'Productname': 'Replica lamp'}])
+        # Reads outside a request stay on the primary
+        self.assertFalse(Product.objects.filter(pk=1000).exists())
+
+    def test_writes_read_from_the_primary_and_set_the_sticky_cookie(self):
+        response = self.client.post('/store/batch/', {'ids': [1000]}, content_type='application/json')
+        self.assertEqual(response.json()['missing'], [1000])
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], settings.DATABASE_REPLICA_STICKY_SECONDS)
+
+        # The cookie keeps this client's following reads on the primary
+        response = self.client.get('/store/batch/?ids=1000')
+        self.assertEqual(response.json()['missing'], [1000])
+
+    def test_failed_writes_set_no_sticky_cookie(self):
+        response = self.client.post('/store/batch/', {'ids': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_export_streams_from_the_replica(self):
+        response = self.client.get('/store/export.ndjson?fields=Productname')
+        self.assertEqual(b''.join(response.streaming_content), b'{"Productname":"Replica lamp"}\n')
+
+
+class ProductExpansionTests(TestCase):
+    def setUp(self):
+        self.seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.category = Category.objects.create(category='Electronics')
+
+    def count_catalog_queries(self, url):
+        # Session and cache bookkeeping is constant per request; only catalog
+        # table reads matter for N+1 detection
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [
+            q for q in queries.captured_queries
+            if any(table in q['sql'] for table in ('store_product', 'users_seller', 'store_category'))
+        ]
+
+    def test_expanded_page_is_a_single_query(self):
+        create_products(3, self.seller, self.category)
+        response, small_page = self.count_catalog_queries('/store/?expand=seller,category&page_size=50')
+
+        # Run the commit hooks so the catalog cache is invalidated
+        with self.captureOnCommitCallbacks(execute=True):
+            create_products(30, self.seller, self.category)
+        response, large_page = self.count_catalog_queries('/store/?expand=seller,category&page_size=50')
+
+        self.assertEqual(len(small_page), 1)
+        self.assertEqual(len(large_page), len(small_page))
+        self.assertEqual(len(response.json()['results']), 33)
+
+    def test_expanded_fields_inline_related_names(self):
+        create_products(1, self.seller, self.category)
+        response = self.client.get('/store/?expand=seller,category')
+        product = response.json()['results'][0]
+        self.assertEqual(product['seller'], {'id': self.seller.id, 'Sellername': 'Tech Store'})
+        self.assertEqual(product['product_category'], {'id': self.category.id, 'category': 'Electronics'})
+
+    def test_unknown_expansion_is_rejected(self):
+        response = self.client.get('/store/?expand=owner')
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.category = Category.objects.create(category='Electronics')
+        create_products(1, self.seller, self.category)
+
+    @override_settings(ALLOWED_HOSTS=['localhost', 'testserver'])
+    def test_image_urls_follow_the_requested_host_and_scheme(self):
+        def image_url(**extra):
+            return self.client.get('/store/', **extra).json()['results'][0]['product_image']
+
+        self.assertTrue(image_url(HTTP_HOST='localhost').startswith('http://localhost/'))
+        self.assertTrue(image_url().startswith('http://testserver/'))
+        self.assertTrue(image_url(secure=True).startswith('https://testserver/'))
+
+    def test_browsable_api_pages_are_not_cached(self):
+        response = self.client.get('/store/categories/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        request = RequestFactory().get('/store/categories/', HTTP_ACCEPT='text/html')
+        self.assertIsNone(cache.get(response_cache_key('categories', request)))
+
+
+class ConditionalCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.category = Category.objects.create(category='Electronics')
+        create_products(2, self.seller, self.category)
+        self.first = self.client.get('/store/')
+
+    def catalog_queries(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/store/', **headers)
+        return response, [q for q in queries.captured_queries if 'store_product' in q['sql']]
+
+    def test_unchanged_catalog_is_revalidated_without_queries(self):
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': self.first['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': self.first['Last-Modified']},
+        ):
+            response, queries = self.catalog_queries(**headers)
+            self.assertEqual(response.status_code, 304, headers)
+            self.assertEqual(queries, [])
+
+    def test_write_changes_the_validators(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_products(1, self.seller, self.category)
+        response, _ = self.catalog_queries(HTTP_IF_NONE_MATCH=self.first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertNotEqual(response['ETag'], self.first['ETag'])
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        autocomplete._index = None
+        self.seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.category = Category.objects.create(category='Lighting')
+
+    def tearDown(self):
+        autocomplete._index = None
+
+    def suggestions(self, response):
+        return [suggestion['name'] for suggestion in response.json()['suggestions']]
+
+    @override_settings(STORE_AUTOCOMPLETE_REFRESH_SECONDS=3600)
+    def test_etag_follows_the_suggestions_not_the_catalog_version(self):
+        first = self.client.get('/store/autocomplete/?q=zeb')
+        self.assertEqual(self.suggestions(first), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(
+                Productname='Zebra lamp', product_description='Striped', initial_price=50,
+                currtent_price=40, seller=self.seller, product_category=self.category,
+            )
+        # This worker's index isn't due for a rebuild: same list, same ETag
+        revalidated = self.client.get('/store/autocomplete/?q=zeb', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        with override_settings(STORE_AUTOCOMPLETE_REFRESH_SECONDS=0):
+            refreshed = self.client.get('/store/autocomplete/?q=zeb', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual(self.suggestions(refreshed), ['Zebra lamp'])
+
+    def test_popularity_is_reloaded_without_catalog_writes(self):
+        _, busy = [
+            Product.objects.create(
+                Productname=name, product_description='Lamp', initial_price=50,
+                currtent_price=40, seller=self.seller, product_category=self.category,
+            )
+            for name in ('Desk lamp', 'Desk lamp XL')
+        ]
+        self.assertEqual(self.suggestions(self.client.get('/store/autocomplete/?q=desk')), ['Desk lamp', 'Desk lamp XL'])
+
+        busy.activity_buckets.create(bucket_start=timezone.now().replace(minute=0, second=0, microsecond=0), views=5)
+        with override_settings(STORE_AUTOCOMPLETE_MAX_AGE_SECONDS=0):
+            response = self.client.get('/store/autocomplete/?q=desk')
+        self.assertEqual(self.suggestions(response), ['Desk lamp XL', 'Desk lamp'])
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.category = Category.objects.create(category='Electronics')
+        create_products(1, self.seller, self.category)
+        self.url = '/store/?page_size=50'
+        self.key = response_cache_key('catalog', RequestFactory().get(self.url))
+        self.first = self.client.get(self.url)
+        # Without captureOnCommitCallbacks the catalog version stays put, as if
+        # the cached entry had simply outlived this write
+        create_products(1, self.seller, self.category)
+
+    def expire_entry(self):
+        version, stored_at, *rest = cache.get(self.key)
+        cache.set(self.key, (version, stored_at - settings.STORE_CACHE_TIMEOUT, *rest))
+
+    def test_expired_response_is_served_while_another_request_refreshes_it(self):
+        self.expire_entry()
+        # As if another worker were already re-rendering this response
+        cache.add(self.key + ':lock', 1, 60)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.content, self.first.content)
+        self.assertEqual(response['ETag'], self.first['ETag'])
+        self.assertFalse([q for q in queries.captured_queries if 'store_product' in q['sql']])
+
+    @override_settings(STORE_CACHE_STALE_SECONDS=0)
+    def test_expired_response_past_the_stale_window_is_rendered_again(self):
+        self.expire_entry()
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_response_from_before_a_write_is_never_served(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_products(1, self.seller, self.category)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertNotEqual(response['ETag'], self.first['ETag'])
+
+    @override_settings(STORE_CACHE_COMPRESS_MIN_BYTES=0)
+    def test_cached_response_is_served_in_the_accepted_encoding(self):
+        # Stored again, now that small bodies are compressed too
+        cache.delete(self.key)
+        identity = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=1.0, identity;q=0.5')
+
+        self.assertFalse([q for q in queries.captured_queries if 'store_product' in q['sql']])
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), identity.content)
+        self.assertEqual(compressed['ETag'], 'W/' + identity['ETag'])
+
+        revalidated = self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'],
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+
+@override_settings(STORE_PRICE_BUCKETS=[50, 100])
+class FacetsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.other = Seller.objects.create(Sellername='Gadget Store', email='gadget@example.com')
+        self.audio = Category.objects.create(category='Audio')
+        self.video = Category.objects.create(category='Video')
+        for price, category, discounted, seller in [
+            (Decimal('49.99'), self.audio, True, self.seller),
+            (50, self.audio, False, self.seller),
+            (100, self.video, True, self.seller),
+            (150, self.video, False, self.other),
+            (None, None, False, self.seller),
+        ]:
+            Product.objects.create(
+                Productname='Product', product_description='Description', currtent_price=price,
+                is_discounted=discounted, seller=seller, product_category=category,
+            )
+
+    def facets(self, query=''):
+        response = self.client.get('/store/facets/?' + query)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts_per_category_price_range_and_discount(self):
+        facets = self.facets()
+        self.assertCountEqual(facets['categories'], [
+            {'id': self.audio.pk, 'category': 'Audio', 'count': 2},
+            {'id': self.video.pk, 'category': 'Video', 'count': 2},
+            {'id': None, 'category': None, 'count': 1},
+        ])
+        # A price equal to a bound counts in the range above it; no price, no range
+        self.assertEqual(facets['price_ranges'], [
+            {'min': 0, 'max': 50, 'count': 1},
+            {'min': 50, 'max': 100, 'count': 1},
+            {'min': 100, 'max': None, 'count': 2},
+        ])
+        self.assertEqual(facets['discount'], {'discounted': 2, 'full_price': 3})
+
+    def test_listing_filters_narrow_the_counts(self):
+        facets = self.facets(f'seller={self.other.pk}')
+        self.assertEqual(facets['categories'], [{'id': self.video.pk, 'category': 'Video', 'count': 1}])
+        self.assertEqual([bucket['count'] for bucket in facets['price_ranges']], [0, 0, 1])
+        self.assertEqual(facets['discount'], {'discounted': 0, 'full_price': 1})
+
+        facets = self.facets('is_discounted=true&max_price=99')
+        self.assertEqual(facets['categories'], [{'id': self.audio.pk, 'category': 'Audio', 'count': 1}])
+        self.assertEqual([bucket['count'] for bucket in facets['price_ranges']], [1, 0, 0])
+
+    def test_invalid_filters_are_rejected(self):
+        self.assertEqual(self.client.get('/store/facets/?min_price=cheap').status_code, 400)
+
+
+@override_settings(STORE_CHANGES_SETTLE_SECONDS=0)
+class ProductChangesTests(TestCase):
+    def setUp(self):
+        seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        category = Category.objects.create(category='Electronics')
+        self.products = create_products(3, seller, category)
+        now = timezone.now()
+        for product, age in zip(self.products, (3, 2, 1)):
+            Product.objects.filter(pk=product.pk).update(updated_at=now - timedelta(hours=age))
+
+    def changes(self, query=''):
+        response = self.client.get('/store/changes/?fields=id&' + query)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [row['id'] for row in body['upserts']], body['deletes'], body['cursor'], body['has_more']
+
+    def test_since_returns_only_later_changes(self):
+        since = (timezone.now() - timedelta(minutes=90)).isoformat()
+        upserts, deletes, _, has_more = self.changes('since=' + since.replace('+', '%2B'))
+        self.assertEqual(upserts, [self.products[2].pk])
+        self.assertEqual((deletes, has_more), ([], False))
+
+    def test_resume_token_pages_through_upserts_and_deletions(self):
+        first, _, cursor, has_more = self.changes('page_size=2')
+        self.assertTrue(has_more)
+        rest, _, cursor, has_more = self.changes(f'page_size=2&cursor={cursor}')
+        self.assertFalse(has_more)
+        self.assertEqual(first + rest, [product.pk for product in self.products])
+
+        # Nothing new since the last token
+        self.assertEqual(self.changes(f'cursor={cursor}')[:2], ([], []))
+
+        deleted, updated, _ = self.products
+        deleted_pk = deleted.pk
+        deleted.delete()
+        updated.product_description = 'Updated'
+        updated.save()
+        upserts, deletes, _, _ = self.changes(f'cursor={cursor}')
+        self.assertEqual(upserts, [updated.pk])
+        self.assertEqual(deletes, [deleted_pk])
+
+    def test_full_download_skips_earlier_deletions(self):
+        self.products[0].delete()
+        upserts, deletes, _, _ = self.changes()
+        self.assertEqual(upserts, [product.pk for product in self.products[1:]])
+        self.assertEqual(deletes, [])
+
+    def test_deleting_a_category_reports_its_products(self):
+        _, _, cursor, _ = self.changes()
+        Category.objects.get(category='Electronics').delete()
+        upserts, _, _, _ = self.changes(f'cursor={cursor}')
+        self.assertEqual(upserts, [product.pk for product in self.products])
+        response = self.client.get(f'/store/changes/?fields=product_category&cursor={cursor}')
+        self.assertEqual([row['product_category'] for row in response.json()['upserts']], [None] * 3)
+
+    def test_invalid_since_and_cursor_are_rejected(self):
+        for query in ('since=yesterday', 'cursor=not-a-token'):
+            self.assertEqual(self.client.get('/store/changes/?' + query).status_code, 400, query)
+
+
+class BatchProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        category = Category.objects.create(category='Electronics')
+        self.ids = [product.pk for product in create_products(3, seller, category)]
+
+    def test_results_follow_the_requested_order_and_list_missing_ids(self):
+        a, b, c = self.ids
+        response = self.client.get(f'/store/batch/?fields=id&ids={c},999999,{a},{c}')
+        self.assertEqual(response.json(), {'results': [{'id': c}, {'id': a}], 'missing': [999999]})
+
+        response = self.client.post(
+            '/store/batch/?fields=id', {'ids': [b, a]}, content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'results': [{'id': b}, {'id': a}], 'missing': []})
+
+    @override_settings(STORE_MAX_BATCH_SIZE=2)
+    def test_missing_or_too_many_ids_are_rejected(self):
+        for query in ('', 'ids=', 'ids=1,2,3', 'ids=1,x'):
+            self.assertEqual(self.client.get('/store/batch/?' + query).status_code, 400, query)
+
+    def test_ids_beyond_64_bits_are_rejected(self):
+        huge = '99999999999999999999999'
+        for url in (f'/store/batch/?ids={huge}', f'/store/?seller={huge}', f'/store/?product_category=1,{huge}'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 400, url)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.category = Category.objects.create(category='Electronics')
+
+    def product(self, name, description, **kwargs):
+        return Product(
+            Productname=name, product_description=description, currtent_price=10,
+            seller=self.seller, product_category=self.category, **kwargs
+        )
+
+    def search(self, query):
+        response = self.client.get(f'/store/search/?fields=Productname&q={query}')
+        self.assertEqual(response.status_code, 200)
+        return [row['Productname'] for row in response.json()['results']]
+
+    def test_index_follows_saves_and_deletes(self):
+        lamp = self.product('Desk lamp', 'Bright LED light')
+        lamp.save()
+        self.product('Floor light', 'Tall lamp for reading').save()
+        # Name matches rank above description matches; prefixes match too
+        self.assertEqual(self.search('lam'), ['Desk lamp', 'Floor light'])
+
+        lamp.Productname = 'Desk torch'
+        lamp.save()
+        self.assertEqual(self.search('lamp'), ['Floor light'])
+        self.assertEqual(self.search('torch'), ['Desk torch'])
+
+        lamp.delete()
+        self.assertEqual(self.search('torch'), [])
+
+    def test_rebuild_command_indexes_unsignalled_rows_and_drops_orphans(self):
+        gone = self.product('Old kettle', 'Steel')
+        gone.save()
+        # bulk_create and raw SQL bypass the signals
+        Product.objects.bulk_create([self.product('Quiet kettle', 'Whistles softly')])
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM store_product WHERE id = %s', [gone.pk])
+        self.assertEqual(self.search('kettle'), [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('kettle'), ['Quiet kettle'])
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT count(*) FROM store_product_fts WHERE rowid = %s', [gone.pk])
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_pages_past_a_64_bit_offset_are_rejected(self):
+        self.product('Desk lamp', 'Bright LED light').save()
+        response = self.client.get('/store/search/?q=lamp&page=99999999999999999999')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/store/search/?q=lamp&page=1000')
+        self.assertEqual((response.status_code, response.json()['results']), (200, []))
+
+
+class CategoryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        categories._cached = (None, {})
+        self.category = Category.objects.create(category='Electronics')
+
+    def category_errors(self, category_id):
+        """product_category validation errors, and the category queries validation made"""
+        serializer = ProductSerializer(data={'product_category': category_id}, partial=True)
+        with CaptureQueriesContext(connection) as queries:
+            serializer.is_valid()
+        return serializer.errors.get('product_category'), [
+            q for q in queries.captured_queries if 'store_category' in q['sql']
+        ]
+
+    def test_product_validation_reads_categories_from_memory(self):
+        categories.get_categories()
+        self.assertEqual(self.category_errors(self.category.pk), (None, []))
+
+        errors, queries = self.category_errors(999999)
+        self.assertEqual(errors[0].code, 'does_not_exist')
+        self.assertEqual(queries, [])
+
+    def test_new_categories_are_picked_up_after_commit(self):
+        categories.get_categories()
+        with self.captureOnCommitCallbacks(execute=True):
+            garden = Category.objects.create(category='Garden')
+        self.assertIsNone(self.category_errors(garden.pk)[0])
+
+        response = self.client.get('/store/categories/')
+        self.assertEqual(
+            [(row['category'], row['product_count']) for row in response.json()],
+            [('Electronics', 0), ('Garden', 0)],
+        )
+
+
+class RendererTests(TestCase):
+    def test_orjson_output_matches_drf(self):
+        data = {
+            'price': Decimal('19.99'),
+            'prices': [Decimal('0.10'), Decimal('1E+2'), None, True],
+            'aware': datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.get_fixed_timezone(120)),
+            'utc': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.get_fixed_timezone(0)),
+            'naive': datetime(2024, 1, 2, 3, 4, 5, 678901),
+            'text': 'line\u2028separator\u2029paragraph \u00e9',
+            7: 'integer key',
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack_round_trips(self):
+        seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        product = create_products(1, seller, Category.objects.create(category='Electronics'))[0]
+        response = self.client.get(f'/store/{product.pk}/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get(f'/store/{product.pk}/').json())
+
+
+class ProductRowSerializerTests(TestCase):
+    def setUp(self):
+        seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        category = Category.objects.create(category='Electronics')
+        create_products(3, seller, category)
+        # Edge cases: no category, no initial price, and a file name that needs URL quoting
+        Product.objects.create(
+            Productname='Odd product',
+            product_description='Description',
+            currtent_price='9.5',
+            discount=None,
+            product_image='productimages/summer sale (1).jpg',
+            seller=seller,
+        )
+        self.request = RequestFactory().get('/store/')
+
+    def assert_same_output(self, fields=None, expand=(), context=None):
+        context = context or {}
+        queryset = Product.objects.order_by('-posted_at', '-id')
+        expected = ProductSerializer(
+            queryset.select_related('seller', 'product_category'),
+            many=True, fields=fields, expand=expand, context=context,
+        ).data
+        rows = ProductRowSerializer(fields, expand, context=context)
+        actual = rows.to_representation(rows.values(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_full_representation_matches_serializer(self):
+        self.assert_same_output(context={'request': self.request})
+
+    def test_relative_urls_without_request_match_serializer(self):
+        self.assert_same_output()
+
+    def test_summary_with_expansions_matches_serializer(self):
+        self.assert_same_output(
+            fields=SUMMARY_FIELDS + ('seller', 'product_category'),
+            expand=('seller', 'category'),
+            context={'request': self.request},
+        )
+
+
+class ProductDetailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.category = Category.objects.create(category='Electronics')
+        self.product = create_products(1, self.seller, self.category)[0]
+        self.url = f'/store/{self.product.pk}/'
+
+    def catalog_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, [q for q in queries.captured_queries if 'store_product' in q['sql']]
+
+    def test_repeat_requests_are_served_from_cache(self):
+        response, first = self.catalog_queries()
+        self.assertEqual(len(first), 1)
+        self.assertEqual(response.json()['seller'], {'id': self.seller.id, 'Sellername': 'Tech Store'})
+        self.assertTrue(response.json()['product_image'].startswith('http://testserver/'))
+
+        response, second = self.catalog_queries()
+        self.assertEqual(second, [])
+        self.assertEqual(response.json()['Productname'], 'Product 0')
+
+    def test_saving_product_or_seller_refreshes_entry(self):
+        self.catalog_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.Productname = 'Renamed'
+            self.product.save()
+        self.assertEqual(self.catalog_queries()[0].json()['Productname'], 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.Sellername = 'Gadget Store'
+            self.seller.save()
+        self.assertEqual(self.catalog_queries()[0].json()['seller']['Sellername'], 'Gadget Store')
+
+    def test_read_stored_after_a_write_is_ignored(self):
+        # A reader fetches the version and the old row, then the write commits
+        # and invalidates before the reader gets to store what it read
+        data, version = get_cached_product(self.product.pk)
+        self.assertIsNone(data)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.Productname = 'Renamed'
+            self.product.save()
+        set_cached_product(self.product.pk, {'Productname': 'Product 0'}, version)
+        self.assertIsNone(get_cached_product(self.product.pk)[0])
+        self.assertEqual(self.catalog_queries()[0].json()['Productname'], 'Renamed')
+
+    def test_deleted_product_is_not_found(self):
+        self.catalog_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class SellerStorefrontTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.other = Seller.objects.create(Sellername='Gadget Store', email='gadget@example.com')
+        self.category = Category.objects.create(category='Electronics')
+        self.products = create_products(3, self.seller, self.category)
+        Product.objects.filter(pk=self.products[0].pk).update(currtent_price=50, is_discounted=True)
+
+    def stats(self, seller):
+        response = self.client.get(f'/store/sellers/{seller.pk}/products/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['stats']
+
+    def test_header_counts_products_and_price_range(self):
+        response = self.client.get(f'/store/sellers/{self.seller.pk}/products/')
+        self.assertEqual(response.json()['seller']['Sellername'], 'Tech Store')
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertEqual(response.json()['stats'], {
+            'product_count': 3, 'discounted_count': 1, 'min_price': '50.00', 'max_price': '80.00',
+        })
+        self.assertIsNotNone(get_cached_seller_header(self.seller.pk)[0])
+
+    def test_unknown_seller_is_not_found(self):
+        response = self.client.get('/store/sellers/999999/products/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['error'], 'Seller not found')
+
+    def test_product_changes_invalidate_header(self):
+        self.stats(self.seller)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[1].currtent_price = 120
+            self.products[1].save()
+        self.assertIsNone(get_cached_seller_header(self.seller.pk)[0])
+        self.assertEqual(self.stats(self.seller)['max_price'], '120.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[1].delete()
+        self.assertEqual(self.stats(self.seller)['product_count'], 2)
+
+    def test_moving_product_invalidates_both_sellers(self):
+        self.assertEqual(self.stats(self.seller)['product_count'], 3)
+        self.assertEqual(self.stats(self.other)['product_count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[2].seller = self.other
+            self.products[2].save()
+        self.assertEqual(self.stats(self.seller)['product_count'], 2)
+        self.assertEqual(self.stats(self.other)['product_count'], 1)
+
+    def test_header_stored_after_a_write_is_ignored(self):
+        header, version = get_cached_seller_header(self.seller.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].delete()
+        set_cached_seller_header(self.seller.pk, {'stats': {'product_count': 3}}, version)
+        self.assertEqual(self.stats(self.seller)['product_count'], 2)
+
+    def test_renaming_seller_invalidates_header(self):
+        self.stats(self.seller)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.Sellername = 'Renamed Store'
+            self.seller.save()
+        response = self.client.get(f'/store/sellers/{self.seller.pk}/products/')
+        self.assertEqual(response.json()['seller']['Sellername'], 'Renamed Store')
+
+
+class DealsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        category = Category.objects.create(category='Electronics')
+        self.products = {}
+        for name, discount, is_discounted, stock in [
+            ('Headphones', 30, True, 5),
+            ('Sold-out speaker', 50, True, 0),
+            ('Cable', 10, True, 1),
+            ('Full-price camera', 40, False, 3),
+            ('Earbuds', 30, True, 2),
+        ]:
+            self.products[name] = Product.objects.create(
+                Productname=name, product_description='Description', currtent_price=10, discount=discount,
+                is_discounted=is_discounted, stock=stock, seller=seller, product_category=category,
+            )
+
+    def page(self, query=''):
+        response = self.client.get('/store/deals/?fields=Productname&' + query)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [row['Productname'] for row in body['results']], body['next'], body['previous']
+
+    def test_only_live_deals_biggest_discount_first(self):
+        # Equal discounts fall back to the newest product first
+        self.assertEqual(self.page()[0], ['Earbuds', 'Headphones', 'Cable'])
+
+    def test_cursors_page_through_the_deals(self):
+        first, cursor, previous = self.page('page_size=2')
+        self.assertEqual((first, previous), (['Earbuds', 'Headphones'], None))
+        second, cursor, previous = self.page(f'page_size=2&cursor={cursor}')
+        self.assertEqual((second, cursor), (['Cable'], None))
+        self.assertEqual(self.page(f'page_size=2&cursor={previous}')[0], first)
+
+    def test_writes_refresh_the_cached_first_page(self):
+        self.page()
+        with self.captureOnCommitCallbacks(execute=True):
+            cable = self.products['Cable']
+            cable.discount = 60
+            cable.save()
+        self.assertEqual(self.page()[0], ['Cable', 'Earbuds', 'Headphones'])
+
+
+class SimilarProductsTests(TestCase):
+    def setUp(self):
+        seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        shoes = Category.objects.create(category='Shoes')
+        phones = Category.objects.create(category='Phones')
+        self.products = {
+            name: Product.objects.create(
+                Productname=name,
+                product_description=description,
+                currtent_price=10,
+                product_image='productimages/product.jpg',
+                seller=seller,
+                product_category=category,
+            )
+            for name, description, category in [
+                ('Red running shoes', 'Light shoes for trail running', shoes),
+                ('Blue running shoes', 'Cushioned shoes for road running', shoes),
+                ('Leather boots', 'Waterproof boots for winter', shoes),
+                ('Running phone armband', 'Carry your phone while running', phones),
+                ('Phone case', 'Protective phone case', phones),
+            ]
+        }
+
+    def similar_names(self, name, scope='all'):
+        product = self.products[name]
+        response = self.client.get(f'/store/{product.pk}/similar/?fields=Productname&scope={scope}')
+        self.assertEqual(response.status_code, 200)
+        return [row['Productname'] for row in response.json()['results']]
+
+    def test_neighbours_are_ranked_by_shared_words(self):
+        self.assertEqual(compute_similar_products(k=2), 5)
+        self.assertEqual(self.similar_names('Red running shoes'), ['Blue running shoes', 'Running phone armband'])
+        self.assertEqual(self.similar_names('Red running shoes', scope='category'), ['Blue running shoes'])
+        self.assertEqual(self.similar_names('Running phone armband', scope='category'), ['Phone case'])
+
+    def test_unknown_products_are_not_found(self):
+        for pk in (999999, 99999999999999999999999):
+            response = self.client.get(f'/store/{pk}/similar/')
+            self.assertEqual(response.status_code, 404, pk)
+
+    def test_incremental_run_only_rescores_affected_products(self):
+        compute_similar_products(k=2)
+        before = timezone.now()
+        boots = self.products['Leather boots']
+        boots.product_description = 'Waterproof running boots'
+        boots.save()
+
+        # The boots themselves, the products that listed them and the ones that now do
+        def listing_boots():
+            return set(ProductSimilarity.objects.filter(similar=boots).values_list('product_id', flat=True))
+        listed_before = listing_boots()
+        scored = compute_similar_products(changed_since=before, k=2)
+        self.assertEqual(scored, len(listed_before | listing_boots() | {boots.pk}))
+        self.assertLess(scored, len(self.products))
+        self.assertIn('Blue running shoes', self.similar_names('Leather boots'))
+
+        def stored():
+            return set(ProductSimilarity.objects.values_list('product', 'similar', 'in_category', 'rank'))
+        incremental = stored()
+        compute_similar_products(k=2)
+        self.assertEqual(incremental, stored())
+
+    def test_incremental_run_adds_new_products_to_existing_lists(self):
+        compute_similar_products(k=1)
+        self.assertEqual(self.similar_names('Red running shoes'), ['Blue running shoes'])
+        before = timezone.now()
+        red = self.products['Red running shoes']
+        Product.objects.create(
+            Productname='Red running shoes XL',
+            product_description=red.product_description,
+            currtent_price=10,
+            seller=red.seller,
+            product_category=red.product_category,
+        )
+
+        compute_similar_products(changed_since=before, k=1)
+        self.assertEqual(self.similar_names('Red running shoes'), ['Red running shoes XL'])
+        self.assertEqual(self.similar_names('Red running shoes', scope='category'), ['Red running shoes XL'])
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.old, self.fresh, self.bought = create_products(3, seller, Category.objects.create(category='Electronics'))
+        self.user = User.objects.create(username='shopper', email='shopper@example.com', password='x')
+
+    def record(self, product, activity_type, hours_ago, times=1):
+        for _ in range(times):
+            activity = ActivityHistory.objects.create(
+                user=self.user, activity_type=activity_type, metadata={'product_id': product.pk}
+            )
+            ActivityHistory.objects.filter(pk=activity.pk).update(timestamp=timezone.now() - timedelta(hours=hours_ago))
+
+    def trending_ids(self):
+        return [row['id'] for row in self.client.get('/store/trending/?fields=id').json()['results']]
+
+    def test_recent_activity_outranks_older_activity(self):
+        # 10 views three half-lives ago are worth 1.25 fresh views
+        self.record(self.old, 'product_view', hours_ago=72, times=10)
+        self.record(self.fresh, 'product_view', hours_ago=1, times=2)
+        self.record(self.bought, 'product_purchase', hours_ago=1)
+        self.assertEqual(update_trending(), 13)
+        self.assertEqual(self.trending_ids(), [self.bought.pk, self.fresh.pk, self.old.pk])
+
+    def test_runs_only_count_new_activity(self):
+        self.record(self.old, 'product_view', hours_ago=1, times=2)
+        update_trending()
+        self.assertEqual(update_trending(), 0)
+
+        self.record(self.fresh, 'product_view', hours_ago=1, times=3)
+        self.assertEqual(update_trending(), 3)
+        self.assertEqual(self.trending_ids(), [self.fresh.pk, self.old.pk])
+        self.assertEqual(self.old.activity_buckets.get().views, 2)
+
+
+class BoughtTogetherTests(TestCase):
+    def setUp(self):
+        seller = Seller.objects.create(Sellername='Tech Store', email='tech@example.com')
+        self.products = create_products(4, seller, Category.objects.create(category='Electronics'))
+        self.user = User.objects.create(username='shopper', email='shopper@example.com', password='x')
+
+    def purchase(self, *indexes):
+        ActivityHistory.objects.create(
+            user=self.user,
+            activity_type='product_purchase',
+            metadata={'product_ids': [self.products[index].pk for index in indexes]},
+        )
+
+    def companion_ids(self, index):
+        response = self.client.get(f'/store/{self.products[index].pk}/bought-together/?fields=id')
+        return [row['id'] for row in response.json()['results']]
+
+    def test_companions_are_ranked_by_lift(self):
+        # Product 1 goes with 0 in most purchases, but 0 sells everywhere; 3 is
+        # only ever bought with 2, so it's the stronger signal for 2
+        for _ in range(3):
+            self.purchase(0, 1)
+        for _ in range(2):
+            self.purchase(0, 2, 3)
+        self.purchase(0)
+        self.purchase(2, 1)
+
+        self.assertEqual(compute_bought_together(k=5, min_count=2, chunk_size=3), 4)
+        self.assertEqual(self.companion_ids(2), [self.products[3].pk, self.products[0].pk])
+        # Products 1 and 2 were only bought together once, below min_count
+        self.assertEqual(self.companion_ids(1), [self.products[0].pk])
+
+    def test_unknown_products_are_not_found(self):
+        self.assertEqual(self.companion_ids(3), [])
+        for pk in (999999, 99999999999999999999999):
+            response = self.client.get(f'/store/{pk}/bought-together/')
+            self.assertEqual(response.status_code, 404, pk)
@@ -0,0 +1,147 @@
+"""
+Trending products, ranked by recent views and purchases.
+
+``manage.py update_trending`` reads the ActivityHistory rows added since its
+last run (ActivityCheckpoint keeps the high-water mark, so history is never
+rescanned), adds them to hourly per-product counts in ProductActivityBucket
+and folds them into each product's decayed score in ProductTrendingScore.
+
+Scores use forward decay. An event at time t adds
+``weight * 2 ** ((t - EPOCH) / half_life)`` and the running sum is stored as
+its natural log. Today's decayed score is that sum divided by
+``2 ** ((now - EPOCH) / half_life)``, a factor shared by every product, so the
+stored values already rank products correctly and rows are only written when
+new activity arrives.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import ActivityHistory
+from .models import ActivityCheckpoint, Product, ProductActivityBucket, ProductTrendingScore
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+CHECKPOINT = 'trending'
+ACTIVITY_TYPES = ('product_view', 'product_purchase')
+
+# Rows this young are left for the next run: a transaction that took its id
+# earlier may still be about to commit below the checkpoint
+SETTLE = timedelta(seconds=30)
+
+
+def decay_exponent(moment):
+    """log(2 ** ((moment - EPOCH) / half_life))"""
+    hours = (moment - EPOCH).total_seconds() / 3600
+    return hours / settings.STORE_TRENDING_HALF_LIFE_HOURS * math.log(2)
+
+
+def current_score(log_score, now=None):
+    """Turn a stored log score into today's decayed activity score"""
+    return math.exp(log_score - decay_exponent(now or timezone.now()))
+
+
+def _logaddexp(a, b):
+    if a == -math.inf:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def activity_product_id(metadata):
+    """Product activity rows carry the product in ``metadata['product_id']``"""
+    try:
+        return int(metadata.get('product_id'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _apply(rows):
+    weights = {'product_view': 1.0, 'product_purchase': settings.STORE_TRENDING_PURCHASE_WEIGHT}
+    counts = defaultdict(lambda: [0, 0])
+    increments = defaultdict(lambda: -math.inf)
+    events = [(activity_product_id(metadata), activity_type, timestamp) for _, activity_type, timestamp, metadata in rows]
+    known = set(
+        Product.objects.filter(id__in={product_id for product_id, _, _ in events if product_id is not None})
+        .values_list('id', flat=True)
+    )
+
+    for product_id, activity_type, timestamp in events:
+        if product_id not in known:
+            continue
+        hour = timestamp.replace(minute=0, second=0, microsecond=0)
+        counts[(product_id, hour)][0 if activity_type == 'product_view' else 1] += 1
+        increments[product_id] = _logaddexp(
+            increments[product_id], math.log(weights[activity_type]) + decay_exponent(timestamp)
+        )
+
+    if counts:
+        buckets = {
+            (bucket.product_id, bucket.bucket_start): bucket
+            for bucket in ProductActivityBucket.objects.filter(
+                product_id__in=increments, bucket_start__in={hour for _, hour in counts}
+            )
+        }
+        new_buckets = []
+        for (product_id, hour), (views, purchases) in counts.items():
+            bucket = buckets.get((product_id, hour))
+            if bucket is None:
+                new_buckets.append(ProductActivityBucket(
+                    product_id=product_id, bucket_start=hour, views=views, purchases=purchases,
+                ))
+            else:
+                bucket.views += views
+                bucket.purchases += purchases
+        ProductActivityBucket.objects.bulk_update(buckets.values(), ['views', 'purchases'])
+        ProductActivityBucket.objects.bulk_create(new_buckets)
+
+    now = timezone.now()
+    scores = ProductTrendingScore.objects.in_bulk(list(increments))
+    for product_id, increment in increments.items():
+        if product_id in scores:
+            scores[product_id].log_score = _logaddexp(scores[product_id].log_score, increment)
+            # bulk_update() skips auto_now
+            scores[product_id].updated_at = now
+    ProductTrendingScore.objects.bulk_update(scores.values(), ['log_score', 'updated_at'])
+    ProductTrendingScore.objects.bulk_create([
+        ProductTrendingScore(product_id=product_id, log_score=increment)
+        for product_id, increment in increments.items()
+        if product_id not in scores
+    ])
+
+
+def update_trending(batch_size=5000, log=None):
+    """Count the product activity recorded since the last run; returns how many rows were read"""
+    settled = timezone.now() - SETTLE
+    ActivityCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    total = 0
+    while True:
+        with transaction.atomic():
+            # Locked so two runs can't count the same rows twice
+            checkpoint = ActivityCheckpoint.objects.select_for_update().get(name=CHECKPOINT)
+            rows = list(
+                ActivityHistory.objects.filter(
+                    id__gt=checkpoint.last_id, activity_type__in=ACTIVITY_TYPES, timestamp__lt=settled
+                )
+                .order_by('id')
+                .values_list('id', 'activity_type', 'timestamp', 'metadata')[:batch_size]
+            )
+            if not rows:
+                break
+            _apply(rows)
+            checkpoint.last_id = rows[-1][0]
+            checkpoint.save(update_fields=['last_id', 'updated_at'])
+        total += len(rows)
+        if log:
+            log(f'Counted {total} activity rows (up to id {checkpoint.last_id})')
+    return total
+
+
+def prune_buckets():
+    """Drop hourly counts older than STORE_TRENDING_BUCKET_DAYS; scores are unaffected"""
+    cutoff = timezone.now() - timedelta(days=settings.STORE_TRENDING_BUCKET_DAYS)
+    deleted, _ = ProductActivityBucket.objects.filter(bucket_start__lt=cutoff).delete()
+    return deleted
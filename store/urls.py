@@ -5,6 +5,19 @@ from .views import *
 urlpatterns = [
     # Define your store URLs here
     path('', store),
+    path('<int:pk>/', product_detail),
+    path('<int:pk>/similar/', similar_products),
+    path('<int:pk>/bought-together/', bought_together),
     path('create/', create_product),
+    path('batch/', batch_products),
+    path('deals/', deals),
+    path('trending/', trending_products),
+    path('search/', search_products),
+    path('autocomplete/', autocomplete),
+    path('categories/', category_list),
+    path('sellers/<int:pk>/products/', seller_products),
+    path('facets/', product_facets_view),
+    path('changes/', product_changes),
+    path('export.ndjson', export_catalog),
     path('auth-test/', auth_test),
 ]
@@ -1,16 +1,46 @@
+from itertools import islice
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.views.decorators.http import condition, require_GET
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.views.decorators.csrf import csrf_exempt
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib.sessions.models import Session
 from .models import Product
-from .serializer import ProductSerializer, CategorySerializer
+from .serializer import (
+    ProductSerializer,
+    CategorySerializer,
+    SellerSummarySerializer,
+    requested_product_fields,
+    ProductRowSerializer,
+    requested_expansions,
+)
+from .pagination import DEALS_ORDERING, paginate_queryset, get_page_size, ordering_columns, requested_ordering, sql_ordering
+from .filters import MAX_ID, filter_products, parse_id_list
+from .search import search_product_ids
+from .facets import product_facets
+from .autocomplete import suggest, suggestions_etag
+from .categories import get_categories
+from .trending import current_score
+from .changes import CHANGES_ORDERING, catalog_changes, decode_token, parse_since, starting_position
+from .cache import (
+    cache_catalog_response,
+    conditional_catalog_response,
+    get_cached_product,
+    set_cached_product,
+    get_cached_seller_header,
+    set_cached_seller_header,
+)
 from users.models import Seller
+from u_buy.renderers import ORJSONRenderer
 
 
 
@@ -58,14 +88,39 @@ def validate_user_session(request):
     return None
 
 @csrf_exempt
+@conditional_catalog_response
+@cache_catalog_response('catalog')
 @api_view(['GET', 'POST'])
 @parser_classes([MultiPartParser, FormParser, JSONParser])
 def store(request):
     if request.method == 'GET':
-        # Handle GET request - return all products
-        All_products = Product.objects.all()
-        serialized_products = ProductSerializer(All_products, many=True)
-        return Response(serialized_products.data)
+        All_products = filter_products(Product.objects.all(), request.query_params)
+
+        # Only fetch the columns the client asked for (plus the ones paging needs),
+        # so large descriptions never leave the database for grid views, and
+        # join any expanded seller/category instead of querying them per product
+        fields = requested_product_fields(request.query_params)
+        expand = requested_expansions(request.query_params)
+        ordering = requested_ordering(request.query_params)
+
+        # Unpaginated listing, kept for existing clients that opt in with ?paginate=false
+        if request.query_params.get('paginate') == 'false':
+            serializer = ProductRowSerializer(fields, expand)
+            rows = serializer.values(All_products)
+            if 'sort' in request.query_params:
+                rows = rows.order_by(*sql_ordering(rows.model, ordering))
+            return Response(serializer.to_representation(rows))
+
+        # Handle GET request - return one cursor page of products in the requested order
+        serializer = ProductRowSerializer(fields, expand, context={'request': request})
+        products, next_cursor, previous_cursor = paginate_queryset(
+            serializer.values(All_products, extra_columns=ordering_columns(ordering)), request, ordering
+        )
+        return Response({
+            'next': next_cursor,
+            'previous': previous_cursor,
+            'results': serializer.to_representation(products),
+        })
     
     elif request.method == 'POST':
         # Handle POST request - create new product
@@ -166,6 +221,336 @@ def store(request):
                 'details': str(e)
             }, status=500)
 
+@conditional_catalog_response
+@cache_catalog_response('deals')
+@api_view(['GET'])
+def deals(request):
+    """Discounted products that are in stock, biggest discount first"""
+    products = filter_products(
+        Product.objects.filter(is_discounted=True, stock__gt=0), request.query_params
+    )
+    serializer = ProductRowSerializer(
+        requested_product_fields(request.query_params),
+        requested_expansions(request.query_params),
+        context={'request': request},
+    )
+    rows, next_cursor, previous_cursor = paginate_queryset(
+        serializer.values(products, extra_columns=ordering_columns(DEALS_ORDERING)), request, DEALS_ORDERING
+    )
+    return Response({
+        'next': next_cursor,
+        'previous': previous_cursor,
+        'results': serializer.to_representation(rows),
+    })
+
+def seller_header(seller):
+    """The storefront header: the seller plus stats over all its products, from one aggregate query"""
+    stats = seller.sellers.aggregate(
+        product_count=Count('id'),
+        discounted_count=Count('id', filter=Q(is_discounted=True)),
+        min_price=Min('currtent_price'),
+        max_price=Max('currtent_price'),
+    )
+    # Formatted like the products' own currtent_price
+    price_field = ProductSerializer().fields['currtent_price']
+    for name in ('min_price', 'max_price'):
+        if stats[name] is not None:
+            stats[name] = price_field.to_representation(stats[name])
+    return {'seller': SellerSummarySerializer(seller).data, 'stats': stats}
+
+@conditional_catalog_response
+@api_view(['GET'])
+def seller_products(request, pk):
+    """
+    One seller's storefront: a header with the seller's product stats, then
+    a cursor page of its products. Accepts the listing's filters and sort orders.
+    """
+    header, header_version = get_cached_seller_header(pk)
+    if header is None:
+        seller = Seller.objects.filter(pk=pk).first()
+        if seller is None:
+            return Response({'error': 'Seller not found'}, status=404)
+        header = seller_header(seller)
+        set_cached_seller_header(pk, header, header_version)
+
+    # The seller filter comes from the URL, not the query string
+    params = request.query_params.copy()
+    params.pop('seller', None)
+    products = filter_products(Product.objects.filter(seller_id=pk), params)
+    ordering = requested_ordering(params)
+    serializer = ProductRowSerializer(
+        requested_product_fields(params),
+        requested_expansions(params),
+        context={'request': request},
+    )
+    rows, next_cursor, previous_cursor = paginate_queryset(
+        serializer.values(products, extra_columns=ordering_columns(ordering)), request, ordering
+    )
+    return Response({
+        **header,
+        'next': next_cursor,
+        'previous': previous_cursor,
+        'results': serializer.to_representation(rows),
+    })
+
+@conditional_catalog_response
+@api_view(['GET'])
+def product_detail(request, pk):
+    """A single product with its seller and category, served from its own cache entry"""
+    data, version = get_cached_product(pk)
+    if data is None:
+        product = Product.objects.select_related('seller', 'product_category').filter(pk=pk).first()
+        if product is None:
+            return Response({'error': 'Product not found'}, status=404)
+        # Serialized without the request so the cached image URL stays host-independent
+        data = dict(ProductSerializer(product, expand=('seller', 'category')).data)
+        set_cached_product(pk, data, version)
+
+    if data['product_image']:
+        data = dict(data, product_image=request.build_absolute_uri(data['product_image']))
+    return Response(data)
+
+@csrf_exempt
+@conditional_catalog_response
+@api_view(['GET', 'POST'])
+def batch_products(request):
+    """
+    Fetch specific products by ID, e.g. for a cart or wishlist.
+
+    IDs come from ?ids=1,2,3, or for long lists a POST body {"ids": [1, 2, 3]}.
+    Results follow the requested order; IDs with no product are listed in "missing".
+    """
+    raw = request.data.get('ids') if request.method == 'POST' else request.query_params.get('ids')
+    if raw in (None, '', []):
+        return Response({'error': 'Product IDs are required', 'message': 'Pass the IDs in ?ids= or a POST body'}, status=400)
+    # Drop repeats but keep the order the client asked for
+    ids = list(dict.fromkeys(parse_id_list(raw, 'ids')))
+    if len(ids) > settings.STORE_MAX_BATCH_SIZE:
+        return Response({
+            'error': 'Too many product IDs',
+            'message': 'Ask for at most %d products at a time' % settings.STORE_MAX_BATCH_SIZE,
+        }, status=400)
+
+    serializer = ProductRowSerializer(
+        requested_product_fields(request.query_params),
+        requested_expansions(request.query_params),
+        context={'request': request},
+    )
+    rows = serializer.values(Product.objects.filter(id__in=ids), ['id'])
+    products = {row['id']: row for row in rows}
+    return Response({
+        'results': serializer.to_representation([products[product_id] for product_id in ids if product_id in products]),
+        'missing': [product_id for product_id in ids if product_id not in products],
+    })
+
+@api_view(['GET'])
+def trending_products(request):
+    """Products with the most recent views and purchases, hottest first"""
+    products = filter_products(Product.objects.all(), request.query_params)
+    serializer = ProductRowSerializer(
+        requested_product_fields(request.query_params),
+        requested_expansions(request.query_params),
+        context={'request': request},
+    )
+    rows = list(
+        serializer.values(products, extra_columns=['trending__log_score'])
+        .filter(trending__isnull=False)
+        .order_by('-trending__log_score', '-id')[:get_page_size(request)]
+    )
+    results = serializer.to_representation(rows)
+    now = timezone.now()
+    for result, row in zip(results, rows):
+        result['trending_score'] = round(current_score(row['trending__log_score'], now), 3)
+    return Response({'results': results})
+
+def related_products_response(request, pk, related):
+    """Serialize a precomputed, ranked list of products related to product ``pk``"""
+    # Past the 64-bit range the join lookup overflows the database driver
+    if pk > MAX_ID:
+        return Response({'error': 'Product not found'}, status=404)
+    serializer = ProductRowSerializer(
+        requested_product_fields(request.query_params),
+        requested_expansions(request.query_params),
+        context={'request': request},
+    )
+    rows = list(serializer.values(related))
+    # An empty list is fine for a product nobody has scored yet, but not for one that doesn't exist
+    if not rows and not Product.objects.filter(pk=pk).exists():
+        return Response({'error': 'Product not found'}, status=404)
+    return Response({'results': serializer.to_representation(rows)})
+
+@api_view(['GET'])
+def similar_products(request, pk):
+    """
+    The product's precomputed similar items, closest first. ?scope=category
+    keeps to the product's own category.
+    """
+    scope = request.query_params.get('scope', 'all')
+    if scope not in ('all', 'category'):
+        return Response({'error': 'Scope must be "all" or "category"'}, status=400)
+
+    # One lookup on the (product, in_category, rank) unique index, joined to the neighbours
+    neighbours = Product.objects.filter(
+        similar_to__product_id=pk, similar_to__in_category=(scope == 'category')
+    ).order_by('similar_to__rank')
+    return related_products_response(request, pk, neighbours)
+
+@api_view(['GET'])
+def bought_together(request, pk):
+    """Products most often bought together with this one, by lift"""
+    # One lookup on the (product, rank) unique index, joined to the companions
+    companions = Product.objects.filter(companion_of__product_id=pk).order_by('companion_of__rank')
+    return related_products_response(request, pk, companions)
+
+@conditional_catalog_response
+@api_view(['GET'])
+def search_products(request):
+    """Full-text search over product names and descriptions, best match first"""
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'Search query is required', 'message': 'Pass the search terms in ?q='}, status=400)
+
+    page_size = get_page_size(request)
+    try:
+        page = max(int(request.query_params.get('page', 1)), 1)
+    except ValueError:
+        return Response({'error': 'Page must be an integer'}, status=400)
+    # The OFFSET has to fit the database's 64-bit integers
+    if (page - 1) * page_size > MAX_ID:
+        return Response({'error': 'Page is out of range', 'message': 'The page offset must fit in 64 bits'}, status=400)
+
+    serializer = ProductRowSerializer(
+        requested_product_fields(request.query_params),
+        requested_expansions(request.query_params),
+        context={'request': request},
+    )
+    ranked = search_product_ids(query, limit=page_size, offset=(page - 1) * page_size)
+    rows = serializer.values(Product.objects.filter(id__in=[product_id for product_id, _ in ranked]), ['id'])
+    products = {row['id']: row for row in rows}
+    # The lookup loses the ranking order, so restore it (skipping rows deleted meanwhile)
+    ordered = [products[product_id] for product_id, _ in ranked if product_id in products]
+    return Response({
+        'query': query,
+        'page': page,
+        'results': serializer.to_representation(ordered),
+    })
+
+def autocomplete_args(request):
+    """(query, limit) from the query string; raises ValueError for a non-integer limit"""
+    return request.GET.get('q', ''), max(int(request.GET.get('limit', 10)), 1)
+
+def autocomplete_etag(request):
+    # Each worker's index may lag the catalog version, so the ETag comes from
+    # the suggestions themselves; they are computed in memory, without queries
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    try:
+        query, limit = autocomplete_args(request)
+    except ValueError:
+        return None
+    return suggestions_etag(suggest(query, limit), request.META.get('HTTP_ACCEPT', ''))
+
+@condition(etag_func=autocomplete_etag)
+@api_view(['GET'])
+def autocomplete(request):
+    """Product and category name suggestions for the search box, most popular first"""
+    try:
+        query, limit = autocomplete_args(request)
+    except ValueError:
+        return Response({'error': 'Limit must be an integer'}, status=400)
+    return Response({'query': query, 'suggestions': suggest(query, limit)})
+
+@conditional_catalog_response
+@cache_catalog_response('categories')
+@api_view(['GET'])
+def category_list(request):
+    """Every category with how many products it holds, by name"""
+    counts = dict(
+        Product.objects.order_by().values_list('product_category').annotate(count=Count('id'))
+    )
+    categories = sorted(get_categories().values(), key=lambda category: category.category.casefold())
+    data = CategorySerializer(categories, many=True).data
+    for category in data:
+        category['product_count'] = counts.get(category['id'], 0)
+    return Response(data)
+
+@conditional_catalog_response
+@cache_catalog_response('facets')
+@api_view(['GET'])
+def product_facets_view(request):
+    """Product counts per category, price range and discount status for the listing filters"""
+    products = filter_products(Product.objects.all(), request.query_params)
+    return Response(product_facets(products))
+
+@api_view(['GET'])
+def product_changes(request):
+    """
+    Products created, updated or deleted since a point in time, for incremental sync.
+
+    Start with ?since=<ISO timestamp> (or nothing, for a full download), then keep
+    passing back the returned cursor until has_more is false. Apply upserts first,
+    then deletes.
+    """
+    token = request.query_params.get('cursor')
+    if token:
+        upsert_position, tombstone_id = decode_token(token)
+    else:
+        since = request.query_params.get('since')
+        upsert_position, tombstone_id = starting_position(parse_since(since) if since else None)
+
+    serializer = ProductRowSerializer(
+        requested_product_fields(request.query_params),
+        requested_expansions(request.query_params),
+        context={'request': request},
+    )
+    upserts, deletes, next_token, has_more = catalog_changes(
+        serializer.values(Product.objects.all(), extra_columns=CHANGES_ORDERING),
+        upsert_position,
+        tombstone_id,
+        get_page_size(request),
+    )
+    return Response({
+        'upserts': serializer.to_representation(upserts),
+        'deletes': deletes,
+        'cursor': next_token,
+        'has_more': has_more,
+    })
+
+@require_GET
+def export_catalog(request):
+    """
+    Stream the catalog as newline-delimited JSON, one product per line.
+
+    Products are read with a chunked iterator (a server-side cursor on
+    PostgreSQL) and written out chunk by chunk, so memory use stays flat
+    however large the catalog is. Accepts the same filters as the listing.
+    """
+    try:
+        products = filter_products(Product.objects.all(), request.GET)
+        serializer = ProductRowSerializer(
+            requested_product_fields(request.GET),
+            requested_expansions(request.GET),
+            context={'request': request},
+        )
+    except ValidationError as e:
+        return JsonResponse({'error': 'Invalid query parameters', 'details': e.detail}, status=400)
+
+    chunk_size = settings.STORE_EXPORT_CHUNK_SIZE
+    queryset = serializer.values(products).order_by('id')
+    # The rows are only read while streaming, after the routing middleware has
+    # returned, so pin the database chosen for this request now
+    rows = queryset.using(queryset.db).iterator(chunk_size=chunk_size)
+    renderer = ORJSONRenderer()
+
+    def lines():
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            yield b''.join(renderer.render(product) + b'\n' for product in serializer.to_representation(chunk))
+
+    return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
 @csrf_exempt
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser, JSONParser])
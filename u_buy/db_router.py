@@ -0,0 +1,93 @@
+"""
+Read-replica routing.
+
+When DATABASE_REPLICA_URL is set, reads made while serving a GET/HEAD/OPTIONS
+request go to the ``replica`` database and everything else goes to
+``default``. Writes always go to ``default``, and so do reads outside a
+request (management commands, shell sessions), since those often read back
+what they have just written.
+
+Replicas lag a little, so a client that has just written (a POST such as
+creating a product or editing a profile) gets a short-lived cookie that
+keeps its reads on the primary for DATABASE_REPLICA_STICKY_SECONDS. That way
+it always sees its own changes.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA = 'replica'
+PRIMARY = 'default'
+STICKY_COOKIE = 'u_buy_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The database alias reads should use for the current request, if any
+_read_alias = ContextVar('read_alias', default=PRIMARY)
+
+# The cache table is written on reads (cache misses), so reading it from a
+# lagging replica would keep serving stale entries
+PRIMARY_ONLY_APPS = ('django_cache',)
+
+
+def replica_configured():
+    if REPLICA not in connections:
+        return False
+    # Under the test runner the replica mirrors the test database; reading it
+    # through its own connection would miss the test's uncommitted rows
+    replica, primary = connections[REPLICA].settings_dict, connections[PRIMARY].settings_dict
+    return any(replica.get(key) != primary.get(key) for key in ('ENGINE', 'NAME', 'HOST', 'PORT'))
+
+
+def reading_from_replica():
+    """True while serving a request whose reads go to the replica"""
+    return _read_alias.get() == REPLICA
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return PRIMARY
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db != REPLICA
+
+
+class ReplicaRoutingMiddleware:
+    """Picks the read database for each request and sets the sticky cookie after writes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+
+        use_replica = request.method in SAFE_METHODS and STICKY_COOKIE not in request.COOKIES
+        token = _read_alias.set(REPLICA if use_replica else PRIMARY)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                STICKY_COOKIE,
+                '1',
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+                httponly=True,
+                # Sent wherever the session cookie is, i.e. from the cross-site frontend too
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
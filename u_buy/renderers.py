@@ -0,0 +1,62 @@
+"""
+Faster renderers for the REST API.
+
+ORJSONRenderer produces the same JSON as DRF's JSONRenderer, but encodes it
+with orjson, which matters for large catalog responses. Anything orjson
+can't encode natively (Decimal, lazy strings...) or must encode the DRF way
+(datetimes) is handed to DRF's own JSONEncoder, so output doesn't change with
+the renderer.
+
+MessagePackRenderer is served to clients that send
+``Accept: application/msgpack``. It needs the optional ``msgpack`` package.
+"""
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Reuse DRF's conversions for Decimal, datetime, date, time, timedelta, lazy strings...
+_drf_default = encoders.JSONEncoder().default
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        # orjson only writes compact UTF-8; leave pretty/ASCII-only output to DRF
+        if orjson is None or indent is not None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=_drf_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # Match DRF: escape U+2028/U+2029 so the output is also valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if msgpack is None:
+            raise ImportError('MessagePackRenderer requires the msgpack package')
+        return msgpack.packb(data, default=_drf_default, use_bin_type=True, datetime=False)
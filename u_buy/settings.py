@@ -1,6 +1,7 @@
 
 from pathlib import Path
-from decouple import config
+from importlib.util import find_spec
+from decouple import config, Csv
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'u_buy.db_router.ReplicaRoutingMiddleware',  # Sends safe-method reads to the replica, if configured
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,6 +78,34 @@ WSGI_APPLICATION = 'u_buy.wsgi.application'
 DATABASES = {
     'default': dj_database_url.parse(config("DATABASE_URL"))
 }
+# Optional read replica; see u_buy/db_router.py
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(DATABASE_REPLICA_URL)
+    # Tests run both aliases against the one test database
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['u_buy.db_router.ReplicaRouter']
+# Seconds a client's reads stay on the primary after it writes, to cover replication lag
+DATABASE_REPLICA_STICKY_SECONDS = config('DATABASE_REPLICA_STICKY_SECONDS', default=10, cast=int)
+# Cache
+# Shared by every gunicorn worker: Redis when REDIS_URL is set, otherwise the
+# database cache table (created by `python manage.py migrate`).
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'u_buy_cache',
+        }
+    }
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.sqlite3',
@@ -190,3 +220,45 @@ CSRF_TRUSTED_ORIGINS = [
 CSRF_COOKIE_HTTPONLY = False
 CSRF_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_SECURE = False  # Set to True in production with HTTPS
+
+# Django REST framework
+# orjson-backed JSON first (the default for clients that don't ask), then
+# MessagePack for `Accept: application/msgpack` when msgpack is installed
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'u_buy.renderers.ORJSONRenderer',
+        *(['u_buy.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Store catalog settings
+STORE_PAGE_SIZE = config('STORE_PAGE_SIZE', default=20, cast=int)
+STORE_MAX_PAGE_SIZE = config('STORE_MAX_PAGE_SIZE', default=100, cast=int)
+# Upper bounds of the price ranges counted by /store/facets/; the last range is open-ended
+STORE_PRICE_BUCKETS = config('STORE_PRICE_BUCKETS', default='500,1000,2500,5000,10000', cast=Csv(int))
+# Products fetched and written per chunk by /store/export.ndjson
+STORE_EXPORT_CHUNK_SIZE = config('STORE_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Most IDs one /store/batch/ request may ask for
+STORE_MAX_BATCH_SIZE = config('STORE_MAX_BATCH_SIZE', default=100, cast=int)
+# Product views older than this many days don't count towards popularity
+STORE_POPULARITY_DAYS = config('STORE_POPULARITY_DAYS', default=30, cast=int)
+# Trending scores (/store/trending/): hours for an event's weight to halve, how many
+# views a purchase is worth, and how many days of hourly counts to keep
+STORE_TRENDING_HALF_LIFE_HOURS = config('STORE_TRENDING_HALF_LIFE_HOURS', default=24, cast=float)
+STORE_TRENDING_PURCHASE_WEIGHT = config('STORE_TRENDING_PURCHASE_WEIGHT', default=5, cast=float)
+STORE_TRENDING_BUCKET_DAYS = config('STORE_TRENDING_BUCKET_DAYS', default=30, cast=int)
+# Each worker rebuilds its /store/autocomplete/ index at most this often after catalog changes
+STORE_AUTOCOMPLETE_REFRESH_SECONDS = config('STORE_AUTOCOMPLETE_REFRESH_SECONDS', default=60, cast=int)
+# ...and at least this often anyway, so popularity rankings follow new views
+STORE_AUTOCOMPLETE_MAX_AGE_SECONDS = config('STORE_AUTOCOMPLETE_MAX_AGE_SECONDS', default=900, cast=int)
+# /store/changes/ holds back rows younger than this, so slow commits aren't skipped
+STORE_CHANGES_SETTLE_SECONDS = config('STORE_CHANGES_SETTLE_SECONDS', default=5, cast=int)
+# Seconds a cached catalog response lives; writes invalidate it sooner
+STORE_CACHE_TIMEOUT = config('STORE_CACHE_TIMEOUT', default=300, cast=int)
+# How long an expired or outdated response may still be served while one
+# request re-renders it, and how long that request holds the render lock
+STORE_CACHE_STALE_SECONDS = config('STORE_CACHE_STALE_SECONDS', default=30, cast=int)
+STORE_CACHE_LOCK_SECONDS = config('STORE_CACHE_LOCK_SECONDS', default=5, cast=int)
+# Cached responses at least this large are also stored gzip (and brotli) encoded
+STORE_CACHE_COMPRESS_MIN_BYTES = config('STORE_CACHE_COMPRESS_MIN_BYTES', default=1024, cast=int)